@@ -0,0 +1,243 @@
+"""
+Bulk booking import (migrations and partner channels).
+
+Rows are streamed from CSV (header row with BookingImport field names) or
+NDJSON (one JSON object per line), validated as they arrive, and written
+in chunks of IMPORT_CHUNK_SIZE with one unordered insert_many, plus one
+bulk_write each for customers and customer activity. Rows that fail
+validation or duplicate an active booking (same fingerprint, see
+idempotency.py) are reported by row number and do not stop the import.
+Confirmation emails are only sent when asked for.
+"""
+import codecs
+import csv
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from catalog import PROMO_CODES, line_items, service_names
+from customer_activity import record_bookings
+from customers import assign_customer_ids, count_bookings
+from email_service import email_service
+from idempotency import booking_fingerprint
+from models import BookingImport, generate_customer_id
+from slots import adjust_slots
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_CHUNK_SIZE = 1000  # rows per insert_many
+MAX_REPORTED_ERRORS = 1000  # further errors are counted but not listed
+
+# Database handle - set by server.py after db connection is established
+db_import = None
+
+
+def set_import_db(database):
+    """Set the database connection for bulk imports"""
+    global db_import
+    db_import = database
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines without holding more than one chunk"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffered = ''
+    async for chunk in chunks:
+        buffered += decoder.decode(chunk)
+        *lines, buffered = buffered.split('\n')
+        for line in lines:
+            yield line.rstrip('\r')
+    buffered += decoder.decode(b'', final=True)
+    if buffered:
+        yield buffered.rstrip('\r')
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]):
+    """Yield (row number, row dict, error) for each CSV record after the header"""
+    header = None
+    record = []
+    row_number = 0
+    async for line in lines:
+        record.append(line)
+        # A quoted field may span lines - the record ends once quotes balance
+        if sum(part.count('"') for part in record) % 2:
+            continue
+        text, record = '\n'.join(record), []
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        # Empty cells are missing values
+        yield row_number, {name: value or None for name, value in zip(header, values)}, None
+
+    if record:
+        yield row_number + 1, None, "Unterminated quoted field"
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]):
+    """Yield (row number, row dict, error) for each NDJSON line"""
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {str(e)}"
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, "Expected a JSON object"
+            continue
+        yield row_number, row, None
+
+
+def build_booking(booking: BookingImport) -> dict:
+    """Turn a validated import row into a booking document"""
+    now = datetime.utcnow().isoformat()
+    doc = booking.model_dump(exclude={'services'})
+    discount = PROMO_CODES.get(booking.promoCode, 0)
+    created_at = booking.createdAt.isoformat() if booking.createdAt else now
+    items = line_items(booking.services, booking.promoCode)
+    doc.update({
+        'bookingId': str(uuid.uuid4()),
+        'items': items,
+        'serviceName': service_names(items),
+        'promoCode': booking.promoCode if discount else None,
+        'discount': discount,
+        'version': 1,
+        'createdAt': created_at,
+        'updatedAt': now,
+    })
+    if booking.status != 'cancelled':
+        doc['fingerprint'] = booking_fingerprint(doc)
+    return doc
+
+
+def _error_message(error: ValidationError) -> str:
+    first = error.errors()[0]
+    field = '.'.join(str(part) for part in first['loc'])
+    return f"{field}: {first['msg']}" if field else first['msg']
+
+
+class ImportReport:
+    """Counts and per-row errors of one import"""
+
+    def __init__(self):
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.customers_created = 0
+        self.errors = []
+
+    def add_error(self, row_number: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': message})
+
+    def to_dict(self) -> dict:
+        return {
+            'received': self.received,
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'customersCreated': self.customers_created,
+            'errors': self.errors,
+            'errorsTruncated': self.failed > len(self.errors),
+        }
+
+
+async def _write_chunk(rows: list, report: ImportReport, notify: bool):
+    """Insert one chunk of (row number, booking) pairs and update derived collections"""
+    docs = [doc for _, doc in rows]
+    try:
+        report.customers_created += await assign_customer_ids(docs)
+    except Exception as e:
+        logger.error(f"Failed to assign customers for {len(docs)} imported bookings: {str(e)}")
+    for doc in docs:
+        # Standalone IDs rather than failing the chunk
+        doc.setdefault('customerId', generate_customer_id())
+
+    failed = {}
+    try:
+        await db_import.bookings.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details['writeErrors']:
+            failed[error['index']] = "Duplicate booking" if error['code'] == 11000 else error['errmsg']
+    for index, message in failed.items():
+        report.add_error(rows[index][0], message)
+
+    inserted = [doc for index, doc in enumerate(docs) if index not in failed]
+    report.inserted += len(inserted)
+    if not inserted:
+        return
+
+    try:
+        await count_bookings(inserted)
+        await record_bookings(inserted)
+    except Exception as e:
+        logger.error(f"Failed to update customers for {len(inserted)} imported bookings: {str(e)}")
+
+    slot_changes = {}
+    for doc in inserted:
+        if doc['status'] != 'cancelled':
+            slot = (doc['date'], doc['time'])
+            slot_changes[slot] = slot_changes.get(slot, 0) + 1
+    try:
+        await adjust_slots(slot_changes)
+    except Exception as e:
+        logger.error(f"Failed to update slot counts for {len(inserted)} imported bookings: {str(e)}")
+
+    if notify:
+        for doc in inserted:
+            try:
+                await email_service.send_customer_confirmation(doc)
+            except Exception as e:
+                logger.error(f"Failed to send confirmation for imported booking {doc['bookingId']}: {str(e)}")
+
+
+async def import_bookings(chunks: AsyncIterator[bytes], fmt: str, notify: bool = False,
+                          chunk_size: Optional[int] = None) -> dict:
+    """Import bookings from a CSV or NDJSON byte stream and return the report"""
+    if db_import is None:
+        raise RuntimeError("Database not initialized for imports")
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    parse = iter_csv_rows if fmt == 'csv' else iter_ndjson_rows
+    report = ImportReport()
+    rows = []
+    async for row_number, data, error in parse(iter_lines(chunks)):
+        report.received += 1
+        if error:
+            report.add_error(row_number, error)
+            continue
+        try:
+            rows.append((row_number, build_booking(BookingImport(**data))))
+        except ValidationError as e:
+            report.add_error(row_number, _error_message(e))
+            continue
+
+        if len(rows) >= chunk_size:
+            await _write_chunk(rows, report, notify)
+            rows = []
+
+    if rows:
+        await _write_chunk(rows, report, notify)
+
+    logger.info(f"Imported {report.inserted} of {report.received} bookings ({report.failed} failed)")
+    return report.to_dict()
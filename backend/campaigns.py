@@ -0,0 +1,285 @@
+"""
+Campaign definitions stored in MongoDB and their schedules.
+
+Definitions live in the `campaigns` collection, so schedule changes made
+through the API take effect without a redeploy. Every gunicorn worker
+runs its own scheduler and periodically re-syncs from the collection;
+each run is claimed in `campaign_runs` under a unique run ID, so a given
+scheduled run is sent by exactly one worker. A run that raises is marked
+'failed' and may be claimed again.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from pymongo.errors import DuplicateKeyError
+
+from email_campaign import send_weekly_campaign
+
+logger = logging.getLogger(__name__)
+
+# Misfire policies for runs missed while no worker was up:
+#   run_once - send once for the most recent missed run, however late
+#   skip     - send only if still within misfireGraceSeconds, otherwise drop
+MISFIRE_POLICIES = ('run_once', 'skip')
+
+# Cron fields a campaign schedule may set (see CampaignSchedule)
+SCHEDULE_CRON_FIELDS = ('month', 'day', 'week', 'day_of_week', 'hour', 'minute')
+
+# How often each worker reloads campaign definitions from MongoDB
+CAMPAIGN_SYNC_INTERVAL = 60  # seconds
+
+# Campaigns created on first startup (previously hard-coded in server.py)
+DEFAULT_CAMPAIGNS = [
+    {
+        'campaignId': 'monday_campaign',
+        'name': 'Monday Morning Email Campaign',
+        'template': 'monday',
+        'schedule': {'day_of_week': 'mon', 'hour': 9, 'minute': 0, 'timezone': None},
+    },
+    {
+        'campaignId': 'friday_campaign',
+        'name': 'Friday Morning Email Campaign',
+        'template': 'friday',
+        'schedule': {'day_of_week': 'fri', 'hour': 9, 'minute': 0, 'timezone': None},
+    },
+]
+
+scheduler = AsyncIOScheduler()
+
+# Database handle - set by server.py after db connection is established
+db_campaigns = None
+
+# campaignId -> updatedAt of the definition currently scheduled in this worker
+_loaded_campaigns = {}
+
+
+def set_campaigns_db(database):
+    """Set the database connection for campaign definitions"""
+    global db_campaigns
+    db_campaigns = database
+
+
+def job_id(campaign_id: str) -> str:
+    return f"campaign:{campaign_id}"
+
+
+def build_trigger(schedule: dict) -> CronTrigger:
+    """
+    Build the cron trigger of a stored schedule (raises ValueError if invalid).
+    Used both for the job and for working out missed and current run times,
+    so they always agree. Fields left out follow cron semantics (every value,
+    or 0 below the most specific field given).
+    """
+    fields = {name: schedule[name] for name in SCHEDULE_CRON_FIELDS if schedule.get(name) is not None}
+    try:
+        return CronTrigger(**fields, timezone=schedule.get('timezone') or scheduler.timezone)
+    except KeyError as e:
+        # zoneinfo raises a KeyError subclass for unknown timezones
+        raise ValueError(f"Unknown timezone: {e}")
+
+
+def latest_fire_time(trigger: CronTrigger, after: datetime, now: datetime) -> Optional[datetime]:
+    """Return the most recent fire time in (after, now], or None"""
+    latest = None
+    fire_time = trigger.get_next_fire_time(None, after + timedelta(seconds=1))
+    while fire_time and fire_time <= now:
+        latest = fire_time
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+    return latest
+
+
+def schedule_campaign(campaign: dict):
+    """Add, replace or remove this worker's job for a campaign definition"""
+    campaign_id = campaign['campaignId']
+
+    if campaign.get('paused'):
+        if scheduler.get_job(job_id(campaign_id)):
+            scheduler.remove_job(job_id(campaign_id))
+        logger.info(f"Campaign {campaign_id} is paused")
+        return
+
+    run_once = campaign.get('misfirePolicy', 'run_once') == 'run_once'
+    scheduler.add_job(
+        run_campaign,
+        build_trigger(campaign['schedule']),
+        args=[campaign_id],
+        id=job_id(campaign_id),
+        name=campaign['name'],
+        replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=None if run_once else campaign.get('misfireGraceSeconds', 3600)
+    )
+
+
+async def handle_missed_run(campaign: dict):
+    """Apply the campaign's misfire policy to a run missed while no worker was up"""
+    if campaign.get('paused') or not campaign.get('lastRunAt'):
+        return
+
+    now = datetime.now(timezone.utc)
+    last_run = datetime.fromisoformat(campaign['lastRunAt'])
+    missed = latest_fire_time(build_trigger(campaign['schedule']), last_run, now)
+    if not missed:
+        return
+
+    campaign_id = campaign['campaignId']
+    lateness = (now - missed).total_seconds()
+    if campaign.get('misfirePolicy') == 'skip' and lateness > campaign.get('misfireGraceSeconds', 3600):
+        logger.warning(f"Skipping missed run of campaign {campaign_id} scheduled for {missed.isoformat()}")
+        return
+
+    logger.info(f"Catching up missed run of campaign {campaign_id} scheduled for {missed.isoformat()}")
+    scheduler.add_job(
+        run_campaign,
+        args=[campaign_id, missed],
+        id=f"campaign-catchup:{campaign_id}",
+        replace_existing=True
+    )
+
+
+async def run_campaign(campaign_id: str, scheduled_for: Optional[datetime] = None):
+    """Run a scheduled campaign once, unless another worker already claimed this run"""
+    campaign = await db_campaigns.campaigns.find_one({'campaignId': campaign_id}, {'_id': 0})
+    if not campaign or campaign.get('paused'):
+        return
+
+    now = datetime.now(timezone.utc)
+    if scheduled_for is None:
+        # Derive the run ID from the schedule so every worker computes the same one
+        scheduled_for = latest_fire_time(
+            build_trigger(campaign['schedule']), now - timedelta(days=1), now
+        ) or now.replace(second=0, microsecond=0)
+
+    run_id = f"{campaign_id}:{scheduled_for.isoformat()}"
+    try:
+        await db_campaigns.campaign_runs.insert_one({
+            'runId': run_id,
+            'campaignId': campaign_id,
+            'scheduledFor': scheduled_for.isoformat(),
+            'startedAt': now.isoformat(),
+            'status': 'running'
+        })
+    except DuplicateKeyError:
+        # A failed run may be claimed again (e.g. by the missed-run catch-up)
+        retried = await db_campaigns.campaign_runs.update_one(
+            {'runId': run_id, 'status': 'failed'},
+            {'$set': {'status': 'running', 'startedAt': now.isoformat()}, '$unset': {'error': ''}}
+        )
+        if not retried.modified_count:
+            logger.info(f"Campaign run {run_id} already claimed by another worker")
+            return
+        logger.info(f"Retrying failed campaign run {run_id}")
+
+    try:
+        summary = await send_weekly_campaign(
+            campaign['template'],
+            campaign.get('segment', 'all'),
+            send_delay=campaign.get('sendDelaySeconds', 0.5),
+            max_recipients=campaign.get('maxPerRun'),
+            campaign_id=campaign_id,
+            run_id=run_id
+        )
+
+        await db_campaigns.campaign_runs.update_one(
+            {'runId': run_id},
+            {'$set': {
+                'status': 'completed',
+                'finishedAt': datetime.now(timezone.utc).isoformat(),
+                'summary': summary
+            }}
+        )
+        await db_campaigns.campaigns.update_one(
+            {'campaignId': campaign_id},
+            {'$set': {'lastRunAt': scheduled_for.isoformat()}}
+        )
+    except Exception as e:
+        # lastRunAt stays behind, so the run is caught up (and reclaimed) on the next start
+        logger.error(f"Campaign run {run_id} failed: {str(e)}")
+        try:
+            await db_campaigns.campaign_runs.update_one(
+                {'runId': run_id},
+                {'$set': {
+                    'status': 'failed',
+                    'finishedAt': datetime.now(timezone.utc).isoformat(),
+                    'error': str(e)
+                }}
+            )
+        except Exception as update_error:
+            logger.error(f"Could not record failure of campaign run {run_id}: {str(update_error)}")
+
+
+async def sync_campaigns():
+    """Reload campaign definitions from MongoDB and reconcile this worker's jobs"""
+    try:
+        campaigns = await db_campaigns.campaigns.find({}, {'_id': 0}).to_list(None)
+    except Exception as e:
+        logger.error(f"Error loading campaign definitions: {str(e)}")
+        return
+
+    seen = set()
+    for campaign in campaigns:
+        campaign_id = campaign['campaignId']
+        seen.add(campaign_id)
+        if _loaded_campaigns.get(campaign_id) == campaign.get('updatedAt'):
+            continue
+
+        first_load = campaign_id not in _loaded_campaigns
+        try:
+            schedule_campaign(campaign)
+            if first_load:
+                await handle_missed_run(campaign)
+        except ValueError as e:
+            logger.error(f"Invalid schedule for campaign {campaign_id}: {str(e)}")
+        _loaded_campaigns[campaign_id] = campaign.get('updatedAt')
+
+    # Drop jobs for campaigns deleted from the collection
+    for campaign_id in set(_loaded_campaigns) - seen:
+        if scheduler.get_job(job_id(campaign_id)):
+            scheduler.remove_job(job_id(campaign_id))
+        del _loaded_campaigns[campaign_id]
+
+
+async def seed_default_campaigns():
+    """Insert the default campaigns if they do not exist yet"""
+    now = datetime.utcnow().isoformat()
+    for campaign in DEFAULT_CAMPAIGNS:
+        await db_campaigns.campaigns.update_one(
+            {'campaignId': campaign['campaignId']},
+            {'$setOnInsert': {
+                **campaign,
+                'segment': 'all',
+                'sendDelaySeconds': 0.5,
+                'maxPerRun': None,
+                'misfirePolicy': 'run_once',
+                'misfireGraceSeconds': 3600,
+                'paused': False,
+                'lastRunAt': None,
+                'createdAt': now,
+                'updatedAt': now
+            }},
+            upsert=True
+        )
+
+
+async def start_campaign_scheduler():
+    """Start the scheduler and load campaign definitions"""
+    if db_campaigns is None:
+        raise RuntimeError("Database not initialized for campaigns")
+
+    # Run claims depend on this unique index
+    await db_campaigns.campaign_runs.create_index([('runId', 1)], unique=True)
+
+    scheduler.start()
+    await seed_default_campaigns()
+    await sync_campaigns()
+    scheduler.add_job(
+        sync_campaigns,
+        IntervalTrigger(seconds=CAMPAIGN_SYNC_INTERVAL),
+        id='sync_campaign_definitions',
+        replace_existing=True
+    )
+    logger.info("Email campaign scheduler started")
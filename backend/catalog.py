@@ -0,0 +1,46 @@
+"""
+Services and promo codes offered through the booking form
+"""
+
+# Services data (matching frontend)
+SERVICES = {
+    # Car Detailing Services
+    '1': 'Exterior Wash & Wax',
+    '2': 'Interior Detailing',
+    '3': 'Premium Full Detail',
+    '4': 'Engine Bay Cleaning',
+    
+    # Home & Property Cleaning Services
+    '5': 'House Cleaning Service',
+    '6': 'Move In/Move Out Cleaning',
+    '7': 'Deep Cleaning Service',
+    '8': 'Post Renovation Cleaning',
+    '9': 'AirBnB Cleaning Service',
+    '10': 'Office Cleaning Service',
+    '11': 'Seniors Cleaning Service',
+    '12': 'Weekly/Bi-Weekly/Monthly Cleaning'
+}
+
+# Promo codes with discounts (percentage)
+PROMO_CODES = {
+    'GOLDY': 30,
+    'SAVE10': 10,
+    'SAVE15': 15,
+    'SAVE20': 20,
+    'WELCOME25': 25,
+    'FIRSTTIME': 20,
+    'REFERRAL15': 15
+}
+
+
+def line_items(service_ids: list, promo_code: str = None) -> list:
+    """Booking line items for the given services, each with the promo code's discount"""
+    discount = PROMO_CODES.get(promo_code, 0)
+    return [
+        {'service': service_id, 'serviceName': SERVICES.get(service_id, service_id), 'discount': discount}
+        for service_id in service_ids
+    ]
+
+
+def service_names(items: list) -> str:
+    return ' + '.join(item['serviceName'] for item in items)
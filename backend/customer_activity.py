@@ -0,0 +1,151 @@
+"""
+Per-customer activity records used for campaign segmentation.
+
+Records are keyed by normalized email and maintained incrementally as
+bookings are created and change status, so segment queries never need
+to scan the bookings collection.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from models import booking_services
+from suppression import normalize_email
+
+logger = logging.getLogger(__name__)
+
+# Service IDs by category (matching SERVICES in catalog.py)
+CAR_SERVICE_IDS = ['1', '2', '3', '4']
+HOME_SERVICE_IDS = ['5', '6', '7', '8', '9', '10', '11', '12']
+
+# Database handle - set by server.py after db connection is established
+db_activity = None
+
+
+def set_activity_db(database):
+    """Set the database connection for customer activity records"""
+    global db_activity
+    db_activity = database
+
+
+def _lapsed_filter(days: int) -> dict:
+    cutoff = (datetime.utcnow().date() - timedelta(days=days)).isoformat()
+    return {'lastBookingDate': {'$lt': cutoff}}
+
+
+# Campaign segments: name -> function returning a customer_activity filter
+SEGMENTS = {
+    'all': lambda: {},
+    'lapsed_60d': lambda: _lapsed_filter(60),
+    'lapsed_90d': lambda: _lapsed_filter(90),
+    'car_detailing': lambda: {'services': {'$in': CAR_SERVICE_IDS}},
+    'home_cleaning': lambda: {'services': {'$in': HOME_SERVICE_IDS}},
+    'repeat': lambda: {'bookingCount': {'$gte': 2}},
+}
+
+
+def get_segment_filter(segment: str) -> dict:
+    """Return the customer_activity query for a named segment"""
+    if segment not in SEGMENTS:
+        raise ValueError(f"Unknown segment: {segment}")
+
+    # Customers whose bookings were all cancelled are never targeted
+    query = {'bookingCount': {'$gt': 0}}
+    query.update(SEGMENTS[segment]())
+    return query
+
+
+def _booking_update(booking: dict) -> dict:
+    update = {
+        '$set': {'name': booking.get('name'), 'updatedAt': datetime.utcnow().isoformat()},
+        '$max': {'lastBookingDate': booking['date']},
+        '$addToSet': {'services': {'$each': booking_services(booking)}},
+        '$inc': {'bookingCount': 1},
+    }
+    # Imported bookings may already be completed
+    if booking.get('status') == 'completed':
+        update['$inc']['completedCount'] = 1
+        update['$max']['lastCompletedDate'] = booking['date']
+    return update
+
+
+async def record_booking(booking: dict):
+    """Fold a newly created booking into the customer's activity record"""
+    if db_activity is None:
+        raise RuntimeError("Database not initialized for customer activity")
+
+    email = normalize_email(booking.get('email'))
+    if not email:
+        return
+
+    await db_activity.customer_activity.update_one({'email': email}, _booking_update(booking), upsert=True)
+
+
+async def record_bookings(bookings: list):
+    """Fold a batch of new bookings into activity records with one bulk_write"""
+    if db_activity is None:
+        raise RuntimeError("Database not initialized for customer activity")
+
+    requests = [
+        UpdateOne({'email': normalize_email(booking.get('email'))}, _booking_update(booking), upsert=True)
+        for booking in bookings
+        if normalize_email(booking.get('email')) and booking.get('status') != 'cancelled'
+    ]
+    if requests:
+        await db_activity.customer_activity.bulk_write(requests, ordered=False)
+
+
+def _status_update(booking: dict, old_status: Optional[str], new_status: str) -> dict:
+    inc = {}
+    # Cancelled bookings do not count towards the customer's activity
+    if new_status == 'cancelled':
+        inc['bookingCount'] = -1
+    elif old_status == 'cancelled':
+        inc['bookingCount'] = 1
+    if new_status == 'completed':
+        inc['completedCount'] = 1
+    elif old_status == 'completed':
+        inc['completedCount'] = -1
+
+    update = {'$set': {'updatedAt': datetime.utcnow().isoformat()}}
+    if inc:
+        update['$inc'] = inc
+    if new_status == 'completed':
+        update['$max'] = {'lastCompletedDate': booking['date']}
+    return update
+
+
+async def record_status_change(booking: dict, old_status: Optional[str], new_status: str):
+    """Adjust the customer's activity record after a booking status change"""
+    if db_activity is None:
+        raise RuntimeError("Database not initialized for customer activity")
+
+    email = normalize_email(booking.get('email'))
+    if not email or old_status == new_status:
+        return
+
+    await db_activity.customer_activity.update_one({'email': email}, _status_update(booking, old_status, new_status))
+
+
+async def record_reschedule(booking: dict):
+    """Move the customer's last booking date forward if a booking was rescheduled later"""
+    email = normalize_email(booking.get('email'))
+    if not email or booking.get('status') == 'cancelled':
+        return
+    await db_activity.customer_activity.update_one({'email': email}, {'$max': {'lastBookingDate': booking['date']}})
+
+
+async def record_status_changes(changes: list):
+    """Adjust activity records for a batch of (booking, old status, new status) with one bulk_write"""
+    if db_activity is None:
+        raise RuntimeError("Database not initialized for customer activity")
+
+    requests = [
+        UpdateOne({'email': normalize_email(booking.get('email'))}, _status_update(booking, old_status, new_status))
+        for booking, old_status, new_status in changes
+        if normalize_email(booking.get('email')) and old_status != new_status
+    ]
+    if requests:
+        await db_activity.customer_activity.bulk_write(requests, ordered=False)
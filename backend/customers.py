@@ -0,0 +1,182 @@
+"""
+Customer records, one per person, shared by all of their bookings.
+
+A customer is keyed by normalized email, or by normalized phone when the
+booking has no email. create_booking upserts the customer in a single
+find_one_and_update and stamps the customer's ID on the booking, so
+returning customers keep their ID and customer lookups are one indexed
+read instead of a scan over bookings.
+"""
+import logging
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from models import generate_customer_id
+from security import normalize_phone
+from suppression import normalize_email
+
+logger = logging.getLogger(__name__)
+
+# Retries when an upsert races another insert for the same customer or draws a taken ID
+CUSTOMER_UPSERT_ATTEMPTS = 3
+
+# Database handle - set by server.py after db connection is established
+db_customers = None
+
+
+def set_customers_db(database):
+    """Set the database connection for customer records"""
+    global db_customers
+    db_customers = database
+
+
+def customer_key(email: Optional[str], phone: Optional[str]) -> Optional[str]:
+    """Return the identity key for a customer, or None if there is nothing to key on"""
+    email = normalize_email(email)
+    if email:
+        return f"email:{email}"
+    phone = normalize_phone(phone)
+    if phone:
+        return f"phone:{phone}"
+    return None
+
+
+async def upsert_customer(booking: dict) -> str:
+    """Create or update the customer for a new booking and return their customer ID"""
+    if db_customers is None:
+        raise RuntimeError("Database not initialized for customers")
+
+    key = customer_key(booking.get('email'), booking.get('phone'))
+    now = datetime.utcnow().isoformat()
+    for attempt in range(CUSTOMER_UPSERT_ATTEMPTS):
+        try:
+            customer = await db_customers.customers.find_one_and_update(
+                {'key': key},
+                {
+                    '$set': {
+                        'name': booking['name'],
+                        'phone': booking['phone'],
+                        'email': normalize_email(booking.get('email')) or None,
+                        'updatedAt': now
+                    },
+                    '$setOnInsert': {
+                        'customerId': generate_customer_id(),
+                        'firstBookingAt': now,
+                        'createdAt': now
+                    },
+                    '$max': {'lastBookingAt': now},
+                    '$inc': {'bookingCount': 1},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return customer['customerId']
+        except DuplicateKeyError:
+            # Either a concurrent booking created this customer (the retry finds
+            # it) or the generated ID is taken (the retry draws a new one)
+            logger.warning(f"Customer upsert conflict for {key}, attempt {attempt + 1}")
+    raise RuntimeError(f"Could not upsert customer {key}")
+
+
+async def assign_customer_ids(bookings: list) -> int:
+    """
+    Set customerId on a batch of bookings, creating missing customers with
+    one bulk_write (bulk imports). Counts are added later by count_bookings,
+    once it is known which bookings were actually inserted.
+    Returns the number of customers created.
+    """
+    if db_customers is None:
+        raise RuntimeError("Database not initialized for customers")
+
+    first_seen = {}
+    for booking in bookings:
+        key = customer_key(booking.get('email'), booking.get('phone'))
+        first_seen.setdefault(key, booking)
+
+    created = 0
+    pending = list(first_seen)
+    for attempt in range(CUSTOMER_UPSERT_ATTEMPTS):
+        now = datetime.utcnow().isoformat()
+        requests = [
+            UpdateOne(
+                {'key': key},
+                {'$setOnInsert': {
+                    'customerId': generate_customer_id(),
+                    'name': first_seen[key]['name'],
+                    'phone': first_seen[key]['phone'],
+                    'email': normalize_email(first_seen[key].get('email')) or None,
+                    'bookingCount': 0,
+                    'createdAt': now,
+                    'updatedAt': now
+                }},
+                upsert=True
+            )
+            for key in pending
+        ]
+        try:
+            result = await db_customers.customers.bulk_write(requests, ordered=False)
+            created += result.upserted_count
+            break
+        except BulkWriteError as e:
+            created += e.details.get('nUpserted', 0)
+            # Retry the upserts that drew a taken ID or raced a concurrent insert
+            pending = [pending[error['index']] for error in e.details['writeErrors'] if error['code'] == 11000]
+            if not pending:
+                break
+            logger.warning(f"Customer upsert conflicts for {len(pending)} customers, attempt {attempt + 1}")
+
+    ids = {}
+    async for customer in db_customers.customers.find(
+        {'key': {'$in': list(first_seen)}}, {'_id': 0, 'key': 1, 'customerId': 1}
+    ):
+        ids[customer['key']] = customer['customerId']
+    for booking in bookings:
+        customer_id = ids.get(customer_key(booking.get('email'), booking.get('phone')))
+        if customer_id:
+            booking['customerId'] = customer_id
+    return created
+
+
+async def count_bookings(bookings: list):
+    """Add a batch of inserted bookings to their customers' counts with one bulk_write"""
+    counts = {}
+    earliest = {}
+    latest = {}
+    for booking in bookings:
+        key = customer_key(booking.get('email'), booking.get('phone'))
+        counts[key] = counts.get(key, 0) + 1
+        earliest[key] = min(earliest.get(key, booking['createdAt']), booking['createdAt'])
+        latest[key] = max(latest.get(key, booking['createdAt']), booking['createdAt'])
+
+    if counts:
+        await db_customers.customers.bulk_write([
+            UpdateOne(
+                {'key': key},
+                {'$inc': {'bookingCount': count},
+                 '$min': {'firstBookingAt': earliest[key]},
+                 '$max': {'lastBookingAt': latest[key]},
+                 '$set': {'updatedAt': datetime.utcnow().isoformat()}}
+            )
+            for key, count in counts.items()
+        ], ordered=False)
+
+
+async def get_customer(customer_id: str) -> Optional[dict]:
+    return await db_customers.customers.find_one({'customerId': customer_id}, {'_id': 0, 'key': 0})
+
+
+async def find_customer(email: Optional[str] = None, phone: Optional[str] = None) -> Optional[dict]:
+    """Find a customer by email or phone"""
+    key = customer_key(email, phone)
+    if key is None:
+        return None
+    customer = await db_customers.customers.find_one({'key': key}, {'_id': 0, 'key': 0})
+    if customer is None and email and phone:
+        # Customers who booked without an email are keyed by phone
+        customer = await db_customers.customers.find_one(
+            {'key': customer_key(None, phone)}, {'_id': 0, 'key': 0}
+        )
+    return customer
@@ -2,8 +2,14 @@ import os
 import logging
 from datetime import datetime
 from email_service import email_service
+from suppression import get_suppressed, make_unsubscribe_token, normalize_email
+from customer_activity import get_segment_filter
+from metrics import TimingSummary
 from motor.motor_asyncio import AsyncIOMotorClient
 import asyncio
+import time
+from typing import Optional
+from urllib.parse import urlencode
 
 logger = logging.getLogger(__name__)
 
@@ -15,31 +21,58 @@ db = client[os.environ['DB_NAME']]
 # Frontend URL
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'https://homecarwash-portal.preview.emergentagent.com')
 
+# Public base URL of the API, used for unsubscribe links
+API_BASE_URL = os.environ.get('API_BASE_URL', FRONTEND_URL)
 
-async def get_all_customer_emails():
-    """Fetch all unique customer emails from bookings"""
+# Recipients are checked against the suppression list one batch at a time
+CAMPAIGN_BATCH_SIZE = 100
+
+
+def get_unsubscribe_url(email: str) -> str:
+    """Build the one-click unsubscribe URL for a recipient"""
+    return f"{API_BASE_URL}/api/unsubscribe/{make_unsubscribe_token(email)}"
+
+
+def get_tracking_pixel_url(campaign_id: str, run_id: str, email: str) -> str:
+    """Build the open-tracking pixel URL for a recipient"""
+    query = urlencode({'c': campaign_id, 'r': run_id, 't': make_unsubscribe_token(email)})
+    return f"{API_BASE_URL}/api/track/open.gif?{query}"
+
+
+def get_unsubscribe_footer(unsubscribe_url: str, tracking_url: Optional[str] = None) -> str:
+    """Unsubscribe footer (and open-tracking pixel) shared by campaign templates"""
+    pixel = (
+        f'<img src="{tracking_url}" width="1" height="1" alt="" style="display: block; border: 0;" />'
+        if tracking_url else ''
+    )
+    return f"""
+                <p style="margin: 12px 0 0 0; color: #999999; font-size: 11px;">
+                    Don't want these emails? <a href="{unsubscribe_url}" style="color: #999999;">Unsubscribe</a>
+                </p>{pixel}"""
+
+
+async def get_campaign_customers(segment: str = 'all'):
+    """Fetch customers in a segment from precomputed activity records"""
     try:
-        # Get all bookings with non-null emails
-        bookings = await db.bookings.find(
-            {"email": {"$exists": True, "$ne": None, "$ne": ""}},
+        # Single indexed query against customer_activity - no scan over bookings
+        records = await db.customer_activity.find(
+            get_segment_filter(segment),
             {"email": 1, "name": 1, "_id": 0}
-        ).to_list(1000)
+        ).to_list(None)
         
-        # Create a dictionary of unique emails with names
-        customers = {}
-        for booking in bookings:
-            email = booking.get('email', '').strip()
-            if email and email not in customers:
-                customers[email] = booking.get('name', 'Valued Customer')
+        customers = {
+            record['email']: record.get('name') or 'Valued Customer'
+            for record in records
+        }
         
-        logger.info(f"Found {len(customers)} unique customers for email campaign")
+        logger.info(f"Found {len(customers)} customers in segment '{segment}' for email campaign")
         return customers
     except Exception as e:
         logger.error(f"Error fetching customer emails: {str(e)}")
         return {}
 
 
-def get_monday_email_template(customer_name: str) -> tuple:
+def get_monday_email_template(customer_name: str, unsubscribe_url: str, tracking_url: Optional[str] = None) -> tuple:
     """Generate Monday email template"""
     subject = "Start Your Week Fresh - Golden Touch Cleaning Services"
     
@@ -108,7 +141,7 @@ def get_monday_email_template(customer_name: str) -> tuple:
             <!-- Footer -->
             <div style="background-color: #f8f9fa; padding: 24px 40px; text-align: center; border-top: 1px solid #e0e0e0;">
                 <p style="margin: 0 0 4px 0; color: #666666; font-size: 14px; font-weight: 600;">Golden Touch Cleaning Services</p>
-                <p style="margin: 0; color: #999999; font-size: 12px;">Calgary's Premier Mobile Cleaning Service</p>
+                <p style="margin: 0; color: #999999; font-size: 12px;">Calgary's Premier Mobile Cleaning Service</p>{get_unsubscribe_footer(unsubscribe_url, tracking_url)}
             </div>
         </div>
     </body>
@@ -118,7 +151,7 @@ def get_monday_email_template(customer_name: str) -> tuple:
     return subject, html_content
 
 
-def get_friday_email_template(customer_name: str) -> tuple:
+def get_friday_email_template(customer_name: str, unsubscribe_url: str, tracking_url: Optional[str] = None) -> tuple:
     """Generate Friday email template"""
     subject = "Weekend Ready? Get Your Cleaning Done - Golden Touch"
     
@@ -187,7 +220,7 @@ def get_friday_email_template(customer_name: str) -> tuple:
             <!-- Footer -->
             <div style="background-color: #f8f9fa; padding: 24px 40px; text-align: center; border-top: 1px solid #e0e0e0;">
                 <p style="margin: 0 0 4px 0; color: #666666; font-size: 14px; font-weight: 600;">Golden Touch Cleaning Services</p>
-                <p style="margin: 0; color: #999999; font-size: 12px;">Calgary's Premier Mobile Cleaning Service</p>
+                <p style="margin: 0; color: #999999; font-size: 12px;">Calgary's Premier Mobile Cleaning Service</p>{get_unsubscribe_footer(unsubscribe_url, tracking_url)}
             </div>
         </div>
     </body>
@@ -197,58 +230,86 @@ def get_friday_email_template(customer_name: str) -> tuple:
     return subject, html_content
 
 
-async def send_weekly_campaign(campaign_type: str = 'monday'):
-    """Send weekly email campaign to all customers"""
+# Campaign templates by name
+TEMPLATES = {
+    'monday': get_monday_email_template,
+    'friday': get_friday_email_template,
+}
+
+
+async def send_weekly_campaign(campaign_type: str = 'monday', segment: str = 'all',
+                               send_delay: float = 0.5, max_recipients: Optional[int] = None,
+                               campaign_id: Optional[str] = None, run_id: Optional[str] = None) -> dict:
+    """Send weekly email campaign to the customers in a segment and return a run summary"""
+    summary = {'sent': 0, 'failed': 0, 'suppressed': 0}
     try:
-        logger.info(f"Starting {campaign_type} email campaign...")
+        logger.info(f"Starting {campaign_type} email campaign for segment '{segment}'...")
         
-        # Get all customer emails
-        customers = await get_all_customer_emails()
+        # Get customer emails for the target segment
+        customers = await get_campaign_customers(segment)
         
         if not customers:
             logger.warning("No customers found for email campaign")
-            return
+            return summary
         
         # Select email template based on campaign type
+        get_template = TEMPLATES[campaign_type]
+        timing_summary = TimingSummary()
         sent_count = 0
         failed_count = 0
+        suppressed_count = 0
         
-        for email, name in customers.items():
-            try:
-                if campaign_type == 'monday':
-                    subject, html_content = get_monday_email_template(name)
-                else:  # friday
-                    subject, html_content = get_friday_email_template(name)
-                
-                # Send email
-                success = await email_service.send_email(email, subject, html_content)
+        recipients = list(customers.items())
+        if max_recipients is not None:
+            recipients = recipients[:max_recipients]
+        for i in range(0, len(recipients), CAMPAIGN_BATCH_SIZE):
+            batch = recipients[i:i + CAMPAIGN_BATCH_SIZE]
+            
+            # One indexed $in lookup per batch instead of one per email
+            suppressed = await get_suppressed(email for email, _ in batch)
+            
+            for email, name in batch:
+                if normalize_email(email) in suppressed:
+                    suppressed_count += 1
+                    continue
                 
-                if success:
-                    sent_count += 1
-                    logger.info(f"Campaign email sent to {email}")
-                else:
+                try:
+                    unsubscribe_url = get_unsubscribe_url(email)
+                    tracking_url = get_tracking_pixel_url(campaign_id, run_id, email) if campaign_id else None
+                    render_started = time.perf_counter()
+                    subject, html_content = get_template(name, unsubscribe_url, tracking_url)
+                    
+                    # Send email (template rendering counts towards its render phase)
+                    timings = {'phases': {'render': time.perf_counter() - render_started}}
+                    success = await email_service.send_email(
+                        email, subject, html_content,
+                        headers={
+                            'List-Unsubscribe': f'<{unsubscribe_url}>',
+                            'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click'
+                        },
+                        timings=timings
+                    )
+                    timing_summary.add(timings)
+                    
+                    if success:
+                        sent_count += 1
+                        logger.info(f"Campaign email sent to {email}")
+                    else:
+                        failed_count += 1
+                        logger.error(f"Failed to send campaign email to {email}")
+                    
+                    # Delay between sends to stay within the campaign's rate limit
+                    await asyncio.sleep(send_delay)
+                    
+                except Exception as e:
                     failed_count += 1
-                    logger.error(f"Failed to send campaign email to {email}")
-                
-                # Small delay to avoid overwhelming the SMTP server
-                await asyncio.sleep(0.5)
-                
-            except Exception as e:
-                failed_count += 1
-                logger.error(f"Error sending campaign email to {email}: {str(e)}")
+                    logger.error(f"Error sending campaign email to {email}: {str(e)}")
         
-        logger.info(f"{campaign_type.capitalize()} campaign complete: {sent_count} sent, {failed_count} failed")
+        logger.info(f"{campaign_type.capitalize()} campaign complete: {sent_count} sent, {failed_count} failed, {suppressed_count} suppressed")
+        summary.update(sent=sent_count, failed=failed_count, suppressed=suppressed_count)
+        summary['timings'] = timing_summary.as_dict()
         
     except Exception as e:
         logger.error(f"Error in weekly campaign: {str(e)}")
-
-
-# Function to be called by scheduler
-def run_monday_campaign():
-    """Run Monday morning campaign"""
-    asyncio.run(send_weekly_campaign('monday'))
-
-
-def run_friday_campaign():
-    """Run Friday morning campaign"""
-    asyncio.run(send_weekly_campaign('friday'))
+    
+    return summary
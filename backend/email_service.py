@@ -1,10 +1,14 @@
 import os
+import time
 import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import logging
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Optional
+from suppression import add_suppression, REASON_HARD_BOUNCE
+from metrics import Histogram, Counter
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
@@ -12,6 +16,14 @@ load_dotenv(ROOT_DIR / '.env', override=False)
 
 logger = logging.getLogger(__name__)
 
+# SMTP instrumentation (per worker process)
+smtp_phase_seconds = Histogram(
+    'smtp_phase_seconds', 'Duration of each email send phase (render, connect, tls, auth, data, total)', ('phase',)
+)
+smtp_responses_total = Counter(
+    'smtp_responses_total', 'SMTP response codes by phase', ('phase', 'code')
+)
+
 
 class EmailService:
     def __init__(self):
@@ -27,35 +39,101 @@ class EmailService:
         else:
             logger.warning('Email service disabled: Gmail credentials not configured')
 
-    async def send_email(self, to_email: str, subject: str, html_content: str):
-        """Send an email using Gmail SMTP"""
+    async def send_email(self, to_email: str, subject: str, html_content: str,
+                         headers: Optional[dict] = None, timings: Optional[dict] = None):
+        """
+        Send an email using Gmail SMTP.
+        Per-phase durations and the final response code are recorded in the
+        SMTP metrics and, if a dict is passed as `timings`, copied into it.
+        A 'render' duration already in timings['phases'] (the caller's template
+        rendering) is counted in the render phase and the total.
+        """
         if not self.enabled:
             logger.info(f'Email sending skipped (not configured): {subject} to {to_email}')
             return False
 
+        timings = timings if timings is not None else {}
+        phases = timings.setdefault('phases', {})
+        started = mark = time.perf_counter() - phases.pop('render', 0.0)
+        phase = 'render'
+        smtp = None
+
+        def finish_phase(name: str):
+            nonlocal mark
+            now = time.perf_counter()
+            phases[name] = now - mark
+            smtp_phase_seconds.observe(now - mark, name)
+            mark = now
+
+        def record_code(code):
+            timings['code'] = code
+            smtp_responses_total.inc(phase, str(code))
+
         try:
             message = MIMEMultipart('alternative')
             message['From'] = f'Golden Touch Cleaning Services <{self.smtp_user}>'
             message['To'] = to_email
             message['Subject'] = subject
+            for name, value in (headers or {}).items():
+                message[name] = value
 
             html_part = MIMEText(html_content, 'html')
             message.attach(html_part)
+            message_bytes = message.as_bytes()
+            finish_phase('render')
+
+            phase = 'connect'
+            smtp = aiosmtplib.SMTP(hostname=self.smtp_host, port=self.smtp_port, start_tls=False)
+            await smtp.connect()
+            finish_phase('connect')
 
-            await aiosmtplib.send(
-                message,
-                hostname=self.smtp_host,
-                port=self.smtp_port,
-                username=self.smtp_user,
-                password=self.smtp_pass,
-                start_tls=True,
-            )
+            phase = 'tls'
+            await smtp.starttls()
+            finish_phase('tls')
+
+            phase = 'auth'
+            await smtp.login(self.smtp_user, self.smtp_pass)
+            finish_phase('auth')
+
+            phase = 'data'
+            await smtp.mail(self.smtp_user)
+            await smtp.rcpt(to_email)
+            response = await smtp.data(message_bytes)
+            finish_phase('data')
+            record_code(response.code)
 
             logger.info(f'Email sent successfully to {to_email}')
             return True
+        except aiosmtplib.SMTPRecipientRefused as e:
+            record_code(e.code)
+            logger.error(f'Recipient refused for {to_email}: {str(e)}')
+            # Permanent (5xx) refusals are hard bounces - stop mailing the address
+            if e.code >= 500:
+                await self._record_hard_bounce(to_email)
+            return False
+        except aiosmtplib.SMTPResponseException as e:
+            record_code(e.code)
+            logger.error(f'Failed to send email to {to_email} during {phase}: {str(e)}')
+            return False
         except (OSError, aiosmtplib.SMTPException) as e:
-            logger.error(f'Failed to send email to {to_email}: {str(e)}')
+            record_code('error')
+            logger.error(f'Failed to send email to {to_email} during {phase}: {str(e)}')
             return False
+        finally:
+            if smtp is not None and smtp.is_connected:
+                try:
+                    await smtp.quit()
+                except (OSError, aiosmtplib.SMTPException):
+                    smtp.close()
+            phases['total'] = time.perf_counter() - started
+            smtp_phase_seconds.observe(phases['total'], 'total')
+
+    async def _record_hard_bounce(self, to_email: str):
+        """Add a hard-bounced address to the suppression list"""
+        try:
+            await add_suppression(to_email, REASON_HARD_BOUNCE, source='smtp')
+        except Exception as e:
+            logger.error(f'Failed to record hard bounce for {to_email}: {str(e)}')
 
     async def send_customer_confirmation(self, booking: dict):
         """Send booking confirmation to customer"""
@@ -75,6 +153,17 @@ class EmailService:
             </tr>
             """
         
+        # One row per service of a multi-service booking
+        service_rows = ""
+        for item in booking.get('items') or [{'serviceName': booking['serviceName']}]:
+            discount_note = f" ({item['discount']}% off)" if item.get('discount') else ""
+            service_rows += f"""
+                                <tr>
+                                    <td style="padding:8px 0; color:#11204d; font-weight:600;">Service:</td>
+                                    <td style="padding:8px 0;">{item['serviceName']}{discount_note}</td>
+                                </tr>
+            """
+        
         html_content = f"""
 <!DOCTYPE html>
 <html lang="en" style="margin:0; padding:0;">
@@ -147,10 +236,7 @@ class EmailService:
                             <table width="100%" cellpadding="0" cellspacing="0" 
                                    style="background:#f9f6ee; padding:22px; border-radius:12px; margin-top:18px; border:1px solid #e6dfcd;">
                                 
-                                <tr>
-                                    <td style="padding:8px 0; color:#11204d; font-weight:600;">Service:</td>
-                                    <td style="padding:8px 0;">{booking['serviceName']}</td>
-                                </tr>
+                                {service_rows}
 
                                 <tr>
                                     <td style="padding:8px 0; color:#11204d; font-weight:600;">Date:</td>
@@ -216,6 +302,105 @@ class EmailService:
         </tr>
     </table>
 
+</body>
+</html>
+        """
+
+        await self.send_email(booking['email'], subject, html_content)
+
+    async def send_customer_rescheduled(self, booking: dict, previous_date: str, previous_time: str):
+        """Tell the customer their booking moved to a new date/time"""
+        if not booking.get('email'):
+            logger.info('Customer email not provided, skipping reschedule email')
+            return
+
+        subject = 'Golden Touch - Booking Rescheduled'
+        html_content = f"""
+<!DOCTYPE html>
+<html lang="en" style="margin:0; padding:0;">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Golden Touch - Booking Rescheduled</title>
+</head>
+
+<body style="margin:0; padding:0; background:#f3f4f6; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;">
+
+    <table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="background:#f3f4f6; padding:40px 0;">
+        <tr>
+            <td align="center">
+
+                <table role="presentation" width="620" cellpadding="0" cellspacing="0" 
+                       style="background:#fefdfb; border-radius:16px; overflow:hidden; box-shadow:0 8px 28px rgba(0,0,0,0.12);">
+
+                    <!-- Title Section -->
+                    <tr>
+                        <td style="background:#11204d; padding:30px 20px; text-align:center;">
+                            <h1 style="margin:0; font-size:26px; color:#e8d08d; font-weight:600; letter-spacing:0.5px;">
+                                Your Booking Has Been Rescheduled
+                            </h1>
+                        </td>
+                    </tr>
+
+                    <!-- Body -->
+                    <tr>
+                        <td style="padding:35px 35px; font-size:15px; color:#333; line-height:1.7; background:#fefdfb;">
+
+                            <p style="margin-top:0;">Hello <strong>{booking['name']}</strong>,</p>
+
+                            <p>
+                                Your <strong style="color:#b48a2a;">{booking['serviceName']}</strong> appointment
+                                has moved to a new time. Everything else about your booking stays the same.
+                            </p>
+
+                            <table width="100%" cellpadding="0" cellspacing="0" 
+                                   style="background:#f9f6ee; padding:22px; border-radius:12px; margin-top:18px; border:1px solid #e6dfcd;">
+                                <tr>
+                                    <td style="padding:8px 0; color:#11204d; font-weight:600;">New Date:</td>
+                                    <td style="padding:8px 0;">{booking['date']}</td>
+                                </tr>
+                                <tr>
+                                    <td style="padding:8px 0; color:#11204d; font-weight:600;">New Time:</td>
+                                    <td style="padding:8px 0;">{booking['time']}</td>
+                                </tr>
+                                <tr>
+                                    <td style="padding:8px 0; color:#9ca3af;">Previously:</td>
+                                    <td style="padding:8px 0; color:#9ca3af; text-decoration:line-through;">{previous_date} at {previous_time}</td>
+                                </tr>
+                                <tr>
+                                    <td style="padding:8px 0; color:#11204d; font-weight:600;">Customer ID:</td>
+                                    <td style="padding:8px 0; font-family:monospace;">{booking.get('customerId', 'N/A')}</td>
+                                </tr>
+                            </table>
+
+                            <p style="margin-top:28px;">
+                                If this time does not work for you, reply directly to this message and our team will help.
+                            </p>
+
+                            <p style="margin-top:35px; font-size:14px; color:#555;">
+                                <strong>Contact Us:</strong><br/>
+                                Phone: <a href="tel:6477875942" style="color:#b48a2a; text-decoration:none;">(647) 787-5942</a><br/>
+                                Email: <a href="mailto:goldentouchcleaningservice25@gmail.com" style="color:#b48a2a; text-decoration:none;">goldentouchcleaningservice25@gmail.com</a>
+                            </p>
+
+                        </td>
+                    </tr>
+
+                    <!-- Footer -->
+                    <tr>
+                        <td style="background:#11204d; padding:25px 35px; text-align:center;">
+                            <p style="margin:0; color:#e8d08d; font-size:16px; font-weight:600;">
+                                Golden Touch Cleaning Services
+                            </p>
+                        </td>
+                    </tr>
+
+                </table>
+
+            </td>
+        </tr>
+    </table>
+
 </body>
 </html>
         """
@@ -0,0 +1,67 @@
+"""
+Duplicate protection for booking submissions.
+
+Clients may send an Idempotency-Key header; the booking created for a key
+is stored in `idempotency_keys` (removed by a TTL index after
+IDEMPOTENCY_KEY_TTL) and returned for any retry with the same key.
+
+Independently of the header, every active booking carries a fingerprint
+of (normalized phone, date, time, services) under a unique index, so a
+repeat submission fails the insert and is answered with the existing
+booking instead of being stored and emailed again. The fingerprint is
+removed when a booking is cancelled, freeing the slot for a new booking.
+"""
+import hashlib
+import logging
+from datetime import datetime
+from typing import Optional
+
+from models import booking_services
+from security import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_TTL = 24 * 3600  # seconds
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Database handle - set by server.py after db connection is established
+db_idempotency = None
+
+
+def set_idempotency_db(database):
+    """Set the database connection for idempotency keys and booking fingerprints"""
+    global db_idempotency
+    db_idempotency = database
+
+
+def booking_fingerprint(booking: dict) -> str:
+    """Fingerprint identifying repeat submissions of the same booking"""
+    # Single-service bookings keep the fingerprint they had before line items
+    services = '+'.join(sorted(booking.get('services') or booking_services(booking)))
+    parts = (normalize_phone(booking['phone']), booking['date'], booking['time'], services)
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+async def get_idempotent_booking(key: str) -> Optional[dict]:
+    """Return the stored key record ({fingerprint, response}) for an Idempotency-Key, if any"""
+    return await db_idempotency.idempotency_keys.find_one({'_id': key})
+
+
+async def store_idempotent_booking(key: str, fingerprint: str, booking: dict):
+    """Remember the booking returned for an Idempotency-Key"""
+    await db_idempotency.idempotency_keys.update_one(
+        {'_id': key},
+        {'$setOnInsert': {
+            'fingerprint': fingerprint,
+            'response': booking,
+            # datetime (not ISO string) so the TTL index applies
+            'createdAt': datetime.utcnow()
+        }},
+        upsert=True
+    )
+
+
+async def find_booking_by_fingerprint(fingerprint: str) -> Optional[dict]:
+    """Return the active booking with this fingerprint, if any"""
+    return await db_idempotency.bookings.find_one({'fingerprint': fingerprint}, {'_id': 0})
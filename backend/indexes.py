@@ -0,0 +1,136 @@
+"""
+MongoDB indexes required by the application's queries.
+
+ensure_indexes() runs in the background at startup and is idempotent;
+scripts/create_indexes.py applies the same definitions by hand.
+index_report() lists required indexes that are missing and existing
+indexes that are not required or have never been used.
+"""
+import logging
+
+from pymongo.errors import OperationFailure
+
+from idempotency import IDEMPOTENCY_KEY_TTL
+
+logger = logging.getLogger(__name__)
+
+# collection -> [(keys, options)]
+INDEXES = {
+    'bookings': [
+        ([('bookingId', 1)], {'unique': True}),
+        ([('email', 1)], {}),
+        ([('customerId', 1)], {}),
+        # calendar and availability (see recurrence.py)
+        ([('date', 1), ('time', 1)], {}),
+        ([('date', 1)], {'name': 'recurring_date_1', 'partialFilterExpression': {'recurrence': {'$type': 'object'}}}),
+        # duplicate submissions of an active booking (see idempotency.py)
+        ([('fingerprint', 1)], {'unique': True, 'partialFilterExpression': {'fingerprint': {'$exists': True}}}),
+    ],
+    # one record per customer (see customers.py)
+    'customers': [
+        ([('key', 1)], {'unique': True}),
+        ([('customerId', 1)], {'unique': True}),
+    ],
+    # booked counts of a day's slots for availability (see slots.py; slots are keyed by _id)
+    'slots': [
+        ([('date', 1)], {}),
+    ],
+    # next waiter of a slot (see waitlist.py)
+    'waitlist': [
+        ([('waitlistId', 1)], {'unique': True}),
+        ([('date', 1), ('time', 1), ('status', 1), ('createdAt', 1)], {}),
+    ],
+    'idempotency_keys': [
+        ([('createdAt', 1)], {'expireAfterSeconds': IDEMPOTENCY_KEY_TTL}),
+    ],
+    'sessions': [
+        ([('token', 1)], {'unique': True}),
+        # TTL index - MongoDB removes sessions once expires_at has passed
+        ([('expires_at', 1)], {'expireAfterSeconds': 0}),
+    ],
+    # revoked stateless (SESSION_MODE=jwt) tokens, dropped once the token expires
+    'revoked_sessions': [
+        ([('jti', 1)], {'unique': True}),
+        ([('expires_at', 1)], {'expireAfterSeconds': 0}),
+    ],
+    'status_checks': [
+        ([('timestamp', 1)], {}),
+    ],
+    # unsubscribes, hard bounces, complaints
+    'suppressions': [
+        ([('email', 1)], {'unique': True}),
+    ],
+    # campaign segmentation
+    'customer_activity': [
+        ([('email', 1)], {'unique': True}),
+        ([('lastBookingDate', 1)], {}),
+        ([('services', 1)], {}),
+    ],
+    'campaigns': [
+        ([('campaignId', 1)], {'unique': True}),
+    ],
+    'campaign_runs': [
+        ([('runId', 1)], {'unique': True}),
+        ([('campaignId', 1), ('scheduledFor', -1)], {}),
+    ],
+    'email_opens': [
+        ([('campaignId', 1), ('runId', 1)], {}),
+    ],
+    'campaign_stats': [
+        ([('campaignId', 1)], {'unique': True}),
+    ],
+    # shared rate limiter (documents are keyed by _id)
+    'rate_limits': [
+        ([('expires_at', 1)], {'expireAfterSeconds': 0}),
+    ],
+    'blocked_ips': [
+        ([('until', 1)], {'expireAfterSeconds': 0}),
+    ],
+}
+
+
+async def ensure_indexes(db):
+    """Create every required index (no-op for indexes that already exist)"""
+    created = 0
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                await db[collection].create_index(keys, **options)
+                created += 1
+            except OperationFailure as e:
+                # e.g. an index with the same keys but different options already exists
+                logger.error(f"Could not ensure index {keys} on {collection}: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error ensuring index {keys} on {collection}: {str(e)}")
+    logger.info(f"Ensured {created} MongoDB indexes")
+
+
+async def index_report(db) -> dict:
+    """Report required indexes that are missing and existing ones that look unused"""
+    missing = []
+    unused = []
+    for collection, indexes in INDEXES.items():
+        existing = await db[collection].index_information()
+        existing_keys = {tuple(info['key']): name for name, info in existing.items()}
+        required_keys = {tuple(keys) for keys, _ in indexes}
+
+        for keys in required_keys - set(existing_keys):
+            missing.append({'collection': collection, 'keys': dict(keys)})
+
+        try:
+            stats = await db[collection].aggregate([{'$indexStats': {}}]).to_list(None)
+        except Exception as e:
+            # $indexStats is unavailable on some hosted tiers
+            logger.warning(f"Index usage stats unavailable for {collection}: {str(e)}")
+            stats = []
+        ops = {stat['name']: stat['accesses']['ops'] for stat in stats}
+
+        for keys, name in existing_keys.items():
+            if name == '_id_':
+                continue
+            if keys not in required_keys:
+                unused.append({'collection': collection, 'name': name, 'reason': 'not required by any query'})
+            elif ops.get(name) == 0:
+                unused.append({'collection': collection, 'name': name, 'reason': 'no accesses since server start'})
+
+    return {'missing': missing, 'unused': unused}
@@ -0,0 +1,120 @@
+"""
+Lightweight in-process metrics (histograms and counters).
+
+Values are per worker process and rendered in the Prometheus text
+exposition format by the /api/metrics endpoint.
+"""
+import bisect
+import threading
+from collections import defaultdict
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series = {}
+        _registry.append(self)
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for labelvalues, series in items:
+            labels = tuple(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {series[-1]}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] += amount
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            labels = tuple(zip(self.labelnames, labelvalues))
+            lines.append(f'{self.name}{_format_labels(labels)} {value}')
+        return lines
+
+
+def render_metrics() -> str:
+    """Render every registered metric in Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class TimingSummary:
+    """Aggregates per-send phase timings and response codes for a campaign run"""
+
+    def __init__(self):
+        self.phases = {}
+        self.codes = defaultdict(int)
+
+    def add(self, timings: dict):
+        for phase, seconds in timings.get('phases', {}).items():
+            stats = self.phases.setdefault(phase, {'count': 0, 'total': 0.0, 'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+        if timings.get('code') is not None:
+            self.codes[str(timings['code'])] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            'phases': {
+                phase: {
+                    'count': stats['count'],
+                    'avg': round(stats['total'] / stats['count'], 4),
+                    'max': round(stats['max'], 4)
+                }
+                for phase, stats in self.phases.items()
+            },
+            'responseCodes': dict(self.codes)
+        }
@@ -1,30 +1,237 @@
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, Field, EmailStr, ValidationInfo, field_validator, model_validator
+from pydantic_core import PydanticCustomError
+from typing import Dict, List, Optional, Union
+from datetime import date as Date, datetime
+import re
 import uuid
 
+from security import sanitize_input, validate_email, validate_phone
+
+# Error type of booking input errors; server.py returns these as a 400 with the message
+BOOKING_INPUT_ERROR = 'booking_input'
+
+BOOKING_STATUSES = ('pending', 'confirmed', 'completed', 'cancelled')
+
+# Allowed status changes: current status -> statuses it may move to
+BOOKING_TRANSITIONS = {
+    'pending': ('confirmed', 'completed', 'cancelled'),
+    'confirmed': ('pending', 'completed', 'cancelled'),
+    'completed': (),
+    'cancelled': ('pending',),
+}
+
+
+def can_transition(old_status: Optional[str], new_status: str) -> bool:
+    """Whether a booking may move from old_status to new_status (setting the same status is a no-op)"""
+    old_status = old_status or 'pending'
+    return old_status == new_status or new_status in BOOKING_TRANSITIONS.get(old_status, ())
+
+# Most services one booking (customer visit) may carry
+MAX_BOOKING_SERVICES = 6
+
+RECURRENCE_FREQUENCIES = ('weekly', 'biweekly', 'monthly')
+MAX_RECURRENCE_COUNT = 520  # ten years of weekly visits
+
+DATE_PATTERN = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+
+
+def booking_input_error(message: str) -> PydanticCustomError:
+    return PydanticCustomError(BOOKING_INPUT_ERROR, message)
+
+
+def parse_booking_date(value: str) -> Date:
+    """Parse a YYYY-MM-DD booking date (raises a booking input error)"""
+    if not value:
+        raise booking_input_error("Missing required field: date")
+    match = DATE_PATTERN.match(value)
+    try:
+        return Date(*map(int, match.groups()))
+    except (AttributeError, ValueError):
+        raise booking_input_error("Invalid date format. Use YYYY-MM-DD")
+
+
+class Recurrence(BaseModel):
+    """Repeats a booking from its date; occurrences are expanded on read (see recurrence.py)"""
+    frequency: str
+    until: Optional[str] = None  # last possible date (YYYY-MM-DD)
+    count: Optional[int] = None  # number of occurrences
+
+    @field_validator('frequency')
+    @classmethod
+    def check_frequency(cls, value: str) -> str:
+        value = (value or '').lower().strip()
+        if value not in RECURRENCE_FREQUENCIES:
+            raise booking_input_error(f"Invalid recurrence. Must be one of: {', '.join(RECURRENCE_FREQUENCIES)}")
+        return value
+
+    @field_validator('until')
+    @classmethod
+    def check_until(cls, value: Optional[str]) -> Optional[str]:
+        if value:
+            parse_booking_date(value)
+        return value or None
+
+    @field_validator('count')
+    @classmethod
+    def check_count(cls, value: Optional[int]) -> Optional[int]:
+        if value is not None and not 1 <= value <= MAX_RECURRENCE_COUNT:
+            raise booking_input_error(f"Recurrence count must be between 1 and {MAX_RECURRENCE_COUNT}")
+        return value
+
 
 class BookingCreate(BaseModel):
     name: str
     email: Optional[EmailStr] = None
     phone: str
     address: str
-    service: str
+    # One service, or several for the same visit (service is then the first of them)
+    service: Optional[str] = None
+    services: Optional[List[str]] = None
     vehicleType: Optional[str] = None
     date: str
     time: str
     notes: Optional[str] = None
     promoCode: Optional[str] = None
+    recurrence: Optional[Recurrence] = None
+
+    # Validators run once while the request body is parsed, in field order
 
+    @field_validator('name', 'address')
+    @classmethod
+    def sanitize_required_text(cls, value: str, info: ValidationInfo) -> str:
+        if not value:
+            raise booking_input_error(f"Missing required field: {info.field_name}")
+        return sanitize_input(value)
+
+    @field_validator('phone')
+    @classmethod
+    def check_phone(cls, value: str) -> str:
+        if not value:
+            raise booking_input_error("Missing required field: phone")
+        if not validate_phone(value):
+            raise booking_input_error("Invalid phone number format")
+        return value
+
+    @field_validator('time')
+    @classmethod
+    def check_required(cls, value: str, info: ValidationInfo) -> str:
+        if not value:
+            raise booking_input_error(f"Missing required field: {info.field_name}")
+        return value
+
+    @field_validator('services', mode='before')
+    @classmethod
+    def check_services(cls, value):
+        if isinstance(value, str):
+            # CSV imports: "2,4"
+            value = value.split(',')
+        if value is None:
+            return value
+        if not isinstance(value, list) or not all(isinstance(service, str) for service in value):
+            raise booking_input_error("services must be a list of service IDs")
+        value = list(dict.fromkeys(service.strip() for service in value if service and service.strip()))
+        if len(value) > MAX_BOOKING_SERVICES:
+            raise booking_input_error(f"At most {MAX_BOOKING_SERVICES} services per booking")
+        return value or None
+
+    @model_validator(mode='after')
+    def check_service(self):
+        # Either field may be empty as long as the other names a service
+        if self.services:
+            self.service = self.services[0]
+        elif self.service and self.service.strip():
+            self.service = self.service.strip()
+            self.services = [self.service]
+        else:
+            raise booking_input_error("Missing required field: service")
+        return self
+
+    @model_validator(mode='after')
+    def check_recurrence_end(self):
+        if self.recurrence and self.recurrence.until and self.recurrence.until < self.date:
+            raise booking_input_error("Recurrence must end on or after the booking date")
+        return self
+
+    @field_validator('date')
+    @classmethod
+    def check_date(cls, value: str) -> str:
+        if parse_booking_date(value) < Date.today():
+            raise booking_input_error("Cannot book dates in the past")
+        return value
+
+    @field_validator('notes')
+    @classmethod
+    def sanitize_notes(cls, value: Optional[str]) -> Optional[str]:
+        return sanitize_input(value) if value else value
+
+    @field_validator('promoCode')
+    @classmethod
+    def normalize_promo_code(cls, value: Optional[str]) -> Optional[str]:
+        return sanitize_input(value).upper() if value else None
+
+
+class BookingImport(BookingCreate):
+    """A booking row from a bulk import - may be historic and carry its own status"""
+    # Checked with the precompiled pattern instead of EmailStr, whose IDNA
+    # domain checks dominate the cost of validating large imports
+    email: Optional[str] = None
+    status: str = 'pending'
+    createdAt: Optional[datetime] = None
+
+    @field_validator('email')
+    @classmethod
+    def check_email(cls, value: Optional[str]) -> Optional[str]:
+        if not value:
+            return None
+        value = value.strip()
+        if not validate_email(value):
+            raise booking_input_error("Invalid email format")
+        return value
+
+    @field_validator('date')
+    @classmethod
+    def check_date(cls, value: str) -> str:
+        # Past dates are allowed
+        parse_booking_date(value)
+        return value
+
+    @field_validator('status')
+    @classmethod
+    def check_status(cls, value: str) -> str:
+        value = (value or 'pending').lower().strip()
+        if value not in BOOKING_STATUSES:
+            raise booking_input_error(f"Invalid status. Must be one of: {', '.join(BOOKING_STATUSES)}")
+        return value
+
+
+import secrets
+
+# Unambiguous characters (no 0/O, 1/I/L) for IDs customers read out over the phone
+CUSTOMER_ID_ALPHABET = '23456789ABCDEFGHJKMNPQRSTUVWXYZ'
+CUSTOMER_ID_LENGTH = 8
 
-import random
-import string
 
 def generate_customer_id():
-    """Generate a unique 8-character customer ID like GT-ABC123"""
-    letters = ''.join(random.choices(string.ascii_uppercase, k=3))
-    numbers = ''.join(random.choices(string.digits, k=3))
-    return f"GT-{letters}{numbers}"
+    """
+    Generate a customer ID like GT-7KQ4M2XD (31^8, about 8.5e11 values).
+    Uniqueness is enforced by the unique index on customers.customerId;
+    see customers.py. Legacy IDs (GT-ABC123) are shorter, so they never clash.
+    """
+    suffix = ''.join(secrets.choice(CUSTOMER_ID_ALPHABET) for _ in range(CUSTOMER_ID_LENGTH))
+    return f"GT-{suffix}"
+
+class BookingItem(BaseModel):
+    """One service of a booking, with its own discount (percent)"""
+    service: str
+    serviceName: str
+    discount: int = 0
+
+
+def booking_services(booking: dict) -> List[str]:
+    """Service IDs of a booking document (bookings stored before line items have only `service`)"""
+    items = booking.get('items')
+    return [item['service'] for item in items] if items else [booking['service']]
+
 
 class Booking(BaseModel):
     bookingId: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -33,14 +240,133 @@ class Booking(BaseModel):
     email: Optional[str] = None
     phone: str
     address: str
-    service: str
-    serviceName: str
+    service: str  # first item's service
+    serviceName: str  # all item names, for display
+    items: List[BookingItem] = Field(default_factory=list)
     vehicleType: Optional[str] = None
     date: str
     time: str
     notes: Optional[str] = None
     promoCode: Optional[str] = None
     discount: int = Field(default=0)
+    recurrence: Optional[Recurrence] = None
+    # Occurrences that differ from the rule, by original date: {"skip": true} or {"date", "time"}
+    recurrenceExceptions: Dict[str, dict] = Field(default_factory=dict)
     status: str = Field(default='pending')
+    # Incremented on every update, for compare-and-set (bookings stored before versioning count as 1)
+    version: int = Field(default=1)
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+    updatedAt: datetime = Field(default_factory=datetime.utcnow)
+
+
+class BookingFilter(BaseModel):
+    """Selects bookings for bulk admin actions"""
+    date: Optional[str] = None
+    status: Optional[str] = None
+    service: Optional[str] = None
+    customerId: Optional[str] = None
+
+
+class BulkStatusUpdate(BaseModel):
+    status: str
+    bookingIds: Optional[List[str]] = None
+    filter: Optional[BookingFilter] = None
+
+
+class ScheduleUpdate(BaseModel):
+    """New slot for a booking (PUT /api/bookings/{id}/schedule)"""
+    date: str
+    time: str
+    expectedVersion: Optional[int] = None
+
+    @field_validator('date')
+    @classmethod
+    def check_date(cls, value: str) -> str:
+        if parse_booking_date(value) < Date.today():
+            raise booking_input_error("Cannot book dates in the past")
+        return value
+
+    @field_validator('time')
+    @classmethod
+    def check_time(cls, value: str) -> str:
+        if not value:
+            raise booking_input_error("Missing required field: time")
+        return value
+
+
+class OccurrenceUpdate(BaseModel):
+    """Skip or move one occurrence of a recurring booking; neither restores it"""
+    skip: bool = False
+    date: Optional[str] = None
+    time: Optional[str] = None
+    expectedVersion: Optional[int] = None
+
+    @field_validator('date')
+    @classmethod
+    def check_date(cls, value: Optional[str]) -> Optional[str]:
+        if value and parse_booking_date(value) < Date.today():
+            raise booking_input_error("Cannot book dates in the past")
+        return value
+
+
+class BookingBatchGet(BaseModel):
+    bookingIds: List[str]
+
+
+class BookingBatchGetResponse(BaseModel):
+    bookings: List[Booking]  # in request order
+    missing: List[str]
+
+
+class Customer(BaseModel):
+    customerId: str
+    name: str
+    email: Optional[str] = None
+    phone: str
+    bookingCount: int = 0
+    firstBookingAt: Optional[str] = None
+    lastBookingAt: Optional[str] = None
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+    updatedAt: datetime = Field(default_factory=datetime.utcnow)
+
+
+class CampaignSchedule(BaseModel):
+    # Cron expressions, e.g. day_of_week 'mon-fri' or day '1' with day_of_week None for monthly
+    month: Optional[str] = None
+    day: Optional[str] = None
+    week: Optional[str] = None
+    day_of_week: Optional[str] = 'mon'
+    hour: Union[int, str] = 9
+    minute: Union[int, str] = 0
+    timezone: Optional[str] = None
+
+
+class CampaignCreate(BaseModel):
+    name: str
+    template: str
+    schedule: CampaignSchedule
+    segment: str = 'all'
+    sendDelaySeconds: float = Field(default=0.5, ge=0)
+    maxPerRun: Optional[int] = Field(default=None, ge=1)
+    misfirePolicy: str = 'run_once'
+    misfireGraceSeconds: int = Field(default=3600, ge=0)
+    paused: bool = False
+
+
+class CampaignUpdate(BaseModel):
+    name: Optional[str] = None
+    template: Optional[str] = None
+    schedule: Optional[CampaignSchedule] = None
+    segment: Optional[str] = None
+    sendDelaySeconds: Optional[float] = Field(default=None, ge=0)
+    maxPerRun: Optional[int] = Field(default=None, ge=1)
+    misfirePolicy: Optional[str] = None
+    misfireGraceSeconds: Optional[int] = Field(default=None, ge=0)
+    paused: Optional[bool] = None
+
+
+class Campaign(CampaignCreate):
+    campaignId: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    lastRunAt: Optional[str] = None
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     updatedAt: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,141 @@
+"""
+Campaign email open tracking.
+
+The tracking pixel endpoint only appends to an in-memory buffer and
+returns a cached GIF. Buffered events are written with one insert_many
+to the append-only `email_opens` collection and rolled up per campaign
+and run, whenever the buffer reaches FLUSH_SIZE or every FLUSH_INTERVAL
+seconds, whichever comes first. Tokens only sign the recipient's email,
+so events are counted only for campaign runs that exist (one lookup per
+flush); others are dropped as 'unknown_run'.
+"""
+import asyncio
+import base64
+import logging
+from collections import Counter as TallyCounter
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# 1x1 transparent GIF served for every pixel hit
+TRANSPARENT_GIF = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+FLUSH_SIZE = 500  # events
+FLUSH_INTERVAL = 5  # seconds
+MAX_BUFFERED_EVENTS = 50000  # events beyond this are dropped until the next flush
+
+open_events_total = Counter(
+    'email_open_events_total', 'Tracking pixel hits by outcome', ('result',)
+)
+
+
+class OpenTracker:
+    """Buffers open events in memory and flushes them in batches"""
+
+    def __init__(self):
+        self.db = None
+        self._buffer = []
+        self._flush_lock = asyncio.Lock()
+        self._flusher = None
+        # Size-triggered flush started by record(), kept so stop() can await it
+        self._flush_task = None
+
+    def record(self, campaign_id: str, run_id: str, email: str):
+        """Buffer an open event - never touches the database"""
+        if len(self._buffer) >= MAX_BUFFERED_EVENTS:
+            open_events_total.inc('dropped')
+            return
+
+        self._buffer.append({
+            'campaignId': campaign_id,
+            'runId': run_id,
+            'email': email,
+            'openedAt': datetime.utcnow().isoformat()
+        })
+        open_events_total.inc('buffered')
+
+        if len(self._buffer) >= FLUSH_SIZE and not self._flush_lock.locked():
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        """Write buffered events with insert_many and roll them up per campaign"""
+        if self.db is None:
+            return
+
+        async with self._flush_lock:
+            events, self._buffer = self._buffer, []
+            if not events:
+                return
+
+            try:
+                events = await self._known_run_events(events)
+                if not events:
+                    return
+                await self.db.email_opens.insert_many(events, ordered=False)
+
+                per_run = TallyCounter((e['campaignId'], e['runId']) for e in events)
+                per_campaign = TallyCounter(e['campaignId'] for e in events)
+                last_open = {}
+                for event in events:
+                    last_open[event['email']] = event['openedAt']
+
+                await self.db.campaign_runs.bulk_write([
+                    UpdateOne({'runId': run_id}, {'$inc': {'opens': count}})
+                    for (_, run_id), count in per_run.items()
+                ], ordered=False)
+                await self.db.campaign_stats.bulk_write([
+                    UpdateOne(
+                        {'campaignId': campaign_id},
+                        {'$inc': {'opens': count}, '$max': {'lastOpenAt': events[-1]['openedAt']}},
+                        upsert=True
+                    )
+                    for campaign_id, count in per_campaign.items()
+                ], ordered=False)
+                # Engagement feeds campaign segmentation
+                await self.db.customer_activity.bulk_write([
+                    UpdateOne({'email': email}, {'$max': {'lastOpenAt': opened_at}})
+                    for email, opened_at in last_open.items()
+                ], ordered=False)
+            except Exception as e:
+                logger.error(f"Error flushing {len(events)} open events: {str(e)}")
+
+    async def _known_run_events(self, events: list) -> list:
+        """Keep the events whose campaign run exists, so forged IDs never create counters"""
+        cursor = self.db.campaign_runs.find(
+            {'runId': {'$in': list({e['runId'] for e in events})}},
+            {'runId': 1, 'campaignId': 1, '_id': 0}
+        )
+        known = {(run['campaignId'], run['runId']) async for run in cursor}
+        valid = [e for e in events if (e['campaignId'], e['runId']) in known]
+        if len(valid) < len(events):
+            open_events_total.inc('unknown_run', amount=len(events) - len(valid))
+        return valid
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.flush()
+
+    def start(self, database):
+        """Start the periodic flusher (call from the running event loop)"""
+        self.db = database
+        if self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def stop(self):
+        """Stop the periodic flusher and write out anything still buffered"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._flush_task is not None:
+            await self._flush_task
+            self._flush_task = None
+        await self.flush()
+
+
+open_tracker = OpenTracker()
@@ -0,0 +1,334 @@
+"""
+Rate limiter state shared across gunicorn workers.
+
+Limits use a sliding-window counter: the estimate for a client is its
+count in the current fixed window plus its previous window's count
+weighted by how much of that window still overlaps the sliding window.
+Each tracked IP costs one small fixed-size record, every check is O(1),
+and records live in an LRU capped at RATE_LIMIT_MAX_TRACKED_IPS. Records
+idle for more than a window are evicted, since they no longer affect
+any estimate.
+
+Window counts are shared through the `rate_limits` collection with
+atomic $inc (expired windows are removed by a TTL index). Each worker
+counts requests locally as an L1, and every RATE_LIMIT_SYNC_INTERVAL
+seconds flushes the pending deltas with one bulk_write and reads the
+global counts back. Only clients close to their limit are checked
+against MongoDB on the request path.
+
+Blocked IPs are stored in `blocked_ips` (TTL on `until`) and mirrored
+into every worker on each sync.
+
+Limits can differ per route: RateLimitPolicies compiles a table of
+exact-path and prefix rules once at startup, and each lookup costs a
+dict probe per path segment, however many rules there are.
+
+Without a database (RATE_LIMIT_BACKEND=memory) all state stays in process.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'mongo').lower()
+RATE_LIMIT_SYNC_INTERVAL = 1.0  # seconds
+RATE_LIMIT_MAX_TRACKED_IPS = int(os.environ.get('RATE_LIMIT_MAX_TRACKED_IPS', 100000))
+
+# Past this share of the limit, requests are counted on the shared counter directly
+L1_EXACT_THRESHOLD = 0.8
+
+
+# Marks a path with no matching rule in RateLimitPolicies
+_NO_RULE = object()
+
+
+class RateLimitPolicy(NamedTuple):
+    """A request budget; name keeps its counters apart from other policies"""
+    name: str
+    limit: int
+    window: int  # seconds
+
+
+class RateLimitPolicies:
+    """
+    Route -> policy lookup table compiled from declarative rules.
+
+    Rule keys are a path, optionally preceded by a method ("GET /api/x").
+    A trailing "/*" makes the rule a prefix ("/api/track/*"). Exact rules
+    win over prefixes, longer prefixes over shorter ones, and method rules
+    over method-less ones. A None policy exempts the route from limiting.
+    """
+
+    def __init__(self, rules: dict, default: Optional[RateLimitPolicy] = None):
+        self.default = default
+        self.exact = {}
+        self.prefixes = {}
+        for pattern, policy in rules.items():
+            method, _, path = pattern.rpartition(' ')
+            if path.endswith('*') and not path.endswith('/*'):
+                raise ValueError(f"Prefix rate limit rules must end with '/*': {pattern}")
+            table = self.prefixes if path.endswith('*') else self.exact
+            table[(method.upper() or None, path.rstrip('*'))] = policy
+
+    def _lookup(self, table: dict, method: str, path: str):
+        policy = table.get((method, path), _NO_RULE)
+        if policy is _NO_RULE:
+            policy = table.get((None, path), _NO_RULE)
+        return policy
+
+    def match(self, method: str, path: str) -> Optional[RateLimitPolicy]:
+        """Return the policy for a request, or None if the route is exempt"""
+        policy = self._lookup(self.exact, method, path)
+        if policy is not _NO_RULE:
+            return policy
+
+        # Try each "/"-terminated prefix of the path, longest first
+        end = len(path)
+        while self.prefixes:
+            end = path.rfind('/', 0, end)
+            if end < 0:
+                break
+            policy = self._lookup(self.prefixes, method, path[:end + 1])
+            if policy is not _NO_RULE:
+                return policy
+        return self.default
+
+
+class WindowCounter:
+    """Per-client sliding-window state for one policy"""
+    __slots__ = ('window', 'window_id', 'previous', 'pending', 'known')
+
+    def __init__(self, window: int, window_id: int):
+        self.window = window
+        self.window_id = window_id
+        self.previous = 0  # total count of the previous window
+        self.pending = 0   # local requests in the current window not yet flushed
+        self.known = 0     # global count of the current window at the last sync
+
+    def roll(self, window_id: int):
+        """Advance to window_id, carrying the last window's total if adjacent"""
+        self.previous = self.known + self.pending if window_id == self.window_id + 1 else 0
+        self.pending = 0
+        self.known = 0
+        self.window_id = window_id
+
+
+class SharedRateLimiter:
+    """Sliding-window request limits and IP blocks shared through MongoDB"""
+
+    def __init__(self, limit: int, window: int, max_tracked: int = RATE_LIMIT_MAX_TRACKED_IPS):
+        self.limit = limit
+        self.window = window
+        self.max_tracked = max_tracked
+        self.db = None
+        # "policy:ip" -> WindowCounter, least recently seen first
+        self.counters = OrderedDict()
+        # Deltas of windows that rolled over before they were flushed: key -> [count, expires_at]
+        # (oldest first, at most max_tracked)
+        self.unflushed = {}
+        # event key -> [unix time the window ends, count] (memory backend only)
+        self.events = {}
+        # ip -> unix time the block ends
+        self.blocked = {}
+        self._syncer = None
+
+    def _expires_at(self, window_id: int, window: int) -> datetime:
+        return datetime.utcfromtimestamp((window_id + 2) * window)
+
+    async def _incr(self, key: str, amount: int, window_id: int, window: int) -> int:
+        doc = await self.db.rate_limits.find_one_and_update(
+            {'_id': key},
+            {'$inc': {'count': amount}, '$setOnInsert': {'expires_at': self._expires_at(window_id, window)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc['count']
+
+    def _stash_pending(self, key: str, counter: WindowCounter):
+        if counter.pending and self.db is not None:
+            entry = self.unflushed.setdefault(
+                f"{key}:{counter.window_id}", [0, self._expires_at(counter.window_id, counter.window)]
+            )
+            entry[0] += counter.pending
+            self._trim_unflushed()
+
+    def _trim_unflushed(self):
+        """Bound unflushed like the counters - drop the oldest deltas (e.g. during a long outage)"""
+        while len(self.unflushed) > self.max_tracked:
+            del self.unflushed[next(iter(self.unflushed))]
+
+    def _counter(self, key: str, window: int, window_id: int) -> WindowCounter:
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters[key] = WindowCounter(window, window_id)
+            if len(self.counters) > self.max_tracked:
+                self._stash_pending(*self.counters.popitem(last=False))
+            return counter
+
+        self.counters.move_to_end(key)
+        if counter.window_id != window_id:
+            self._stash_pending(key, counter)
+            counter.roll(window_id)
+        return counter
+
+    async def allow(self, ip: str, policy: Optional[RateLimitPolicy] = None) -> bool:
+        """Count a request from ip under policy (default limit if None); return False if over the limit"""
+        name, limit, window = policy if policy is not None else ('req', self.limit, self.window)
+        key = f"{name}:{ip}"
+        now = time.time()
+        window_id = int(now // window)
+        counter = self._counter(key, window, window_id)
+
+        overlap = 1.0 - (now - window_id * window) / window
+        estimate = counter.previous * overlap + counter.known + counter.pending
+        if estimate >= limit:
+            return False
+
+        if self.db is None or estimate < limit * L1_EXACT_THRESHOLD:
+            counter.pending += 1
+            return True
+
+        # Close to the limit: count on the shared counter for an exact answer
+        pending, counter.pending = counter.pending + 1, 0
+        try:
+            counter.known = await self._incr(f"{key}:{window_id}", pending, window_id, window)
+        except Exception as e:
+            logger.error(f"Rate limit counter error for {key}: {str(e)}")
+            counter.pending += pending
+            return True
+        return counter.previous * overlap + counter.known <= limit
+
+    async def count_event(self, name: str, ip: str, window: int) -> int:
+        """Count an event (e.g. a failed login) for ip in a fixed window and return the total"""
+        window_id = int(time.time() // window)
+        key = f"{name}:{ip}:{window_id}"
+        if self.db is not None:
+            try:
+                return await self._incr(key, 1, window_id, window)
+            except Exception as e:
+                logger.error(f"Rate limit counter error for {key}: {str(e)}")
+
+        entry = self.events.setdefault(key, [(window_id + 1) * window, 0])
+        entry[1] += 1
+        return entry[1]
+
+    def is_blocked(self, ip: str) -> bool:
+        until = self.blocked.get(ip)
+        if until is None:
+            return False
+        if time.time() < until:
+            return True
+        # Block expired, remove it
+        del self.blocked[ip]
+        return False
+
+    async def block(self, ip: str, duration: int):
+        until = time.time() + duration
+        self.blocked[ip] = until
+        if self.db is None:
+            return
+        try:
+            await self.db.blocked_ips.update_one(
+                {'_id': ip},
+                {'$set': {'until': datetime.utcfromtimestamp(until)}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Error sharing block for {ip}: {str(e)}")
+
+    def evict_idle(self, now: float):
+        """Drop records idle for over a window - they no longer affect any estimate"""
+        while self.counters:
+            key, counter = next(iter(self.counters.items()))
+            if counter.window_id >= int(now // counter.window) - 1:
+                break
+            self._stash_pending(key, counter)
+            del self.counters[key]
+
+    async def sync(self):
+        """Evict idle records, flush local deltas, refresh global counts and mirror shared blocks"""
+        now = time.time()
+        self.evict_idle(now)
+        for key in [key for key, entry in self.events.items() if entry[0] <= now]:
+            del self.events[key]
+
+        if self.db is None:
+            return
+
+        # Deltas of windows that have expired no longer matter anywhere
+        expired_before = datetime.utcfromtimestamp(now)
+        deltas = {key: entry for key, entry in self.unflushed.items() if entry[1] > expired_before}
+        self.unflushed = {}
+        active = {}
+        for counter_key, counter in self.counters.items():
+            if counter.window_id != int(now // counter.window):
+                continue
+            key = f"{counter_key}:{counter.window_id}"
+            active[key] = (counter, counter.window_id)
+            if counter.pending:
+                entry = deltas.setdefault(key, [0, self._expires_at(counter.window_id, counter.window)])
+                entry[0] += counter.pending
+                counter.known += counter.pending
+                counter.pending = 0
+
+        if deltas:
+            try:
+                await self.db.rate_limits.bulk_write([
+                    UpdateOne(
+                        {'_id': key},
+                        {'$inc': {'count': count}, '$setOnInsert': {'expires_at': expires_at}},
+                        upsert=True
+                    )
+                    for key, (count, expires_at) in deltas.items()
+                ], ordered=False)
+            except Exception as e:
+                logger.error(f"Error flushing rate limit counts: {str(e)}")
+                # Keep the deltas for the next sync (an unordered write may have
+                # applied some of them - over-counting is safer than losing them)
+                for key, (count, expires_at) in self.unflushed.items():
+                    deltas.setdefault(key, [0, expires_at])[0] += count
+                # Older deltas first, so trimming drops those
+                self.unflushed = deltas
+                self._trim_unflushed()
+
+        try:
+            if active:
+                async for doc in self.db.rate_limits.find({'_id': {'$in': list(active)}}):
+                    counter, window_id = active[doc['_id']]
+                    # Skip counters that rolled over to a new window during the query
+                    if counter.window_id == window_id:
+                        counter.known = max(counter.known, doc['count'])
+
+            blocked = {}
+            async for doc in self.db.blocked_ips.find({'until': {'$gt': datetime.utcfromtimestamp(now)}}):
+                blocked[doc['_id']] = (doc['until'] - datetime(1970, 1, 1)).total_seconds()
+            self.blocked = blocked
+        except Exception as e:
+            logger.error(f"Error syncing rate limits: {str(e)}")
+
+    async def _sync_periodically(self):
+        while True:
+            await asyncio.sleep(RATE_LIMIT_SYNC_INTERVAL)
+            await self.sync()
+
+    def start(self, database):
+        """Share state through MongoDB and start the periodic sync (call from the event loop)"""
+        if RATE_LIMIT_BACKEND == 'mongo':
+            self.db = database
+        else:
+            logger.info("Rate limiter using per-worker memory backend")
+        if self._syncer is None:
+            self._syncer = asyncio.get_running_loop().create_task(self._sync_periodically())
+
+    async def stop(self):
+        if self._syncer is not None:
+            self._syncer.cancel()
+            self._syncer = None
+        await self.sync()
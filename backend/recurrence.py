@@ -0,0 +1,133 @@
+"""
+Recurring bookings.
+
+A recurring booking is one document: its date is the first occurrence,
+`recurrence` holds the rule and `recurrenceExceptions` the occurrences
+that were skipped or moved, keyed by their original date. Occurrences
+are never stored. expand_booking() generates them for a date window,
+jumping straight to the first occurrence in the window, so the cost of
+a query depends on the window and not on how long ago the series began.
+"""
+import calendar
+import heapq
+from datetime import date as Date, timedelta
+from typing import Iterable, Iterator, Optional, Tuple
+
+# Days between occurrences (monthly repeats on the same day of the month)
+FREQUENCY_DAYS = {'weekly': 7, 'biweekly': 14}
+
+
+def parse_date(value: str) -> Date:
+    return Date.fromisoformat(value)
+
+
+def occurrence_date(start: Date, frequency: str, index: int) -> Date:
+    """Date of the index-th occurrence (0 = the booking's own date)"""
+    if frequency in FREQUENCY_DAYS:
+        return start + timedelta(days=FREQUENCY_DAYS[frequency] * index)
+    # Monthly: same day of the month, or the month's last day if it is shorter
+    year, month = divmod(start.month - 1 + index, 12)
+    year += start.year
+    month += 1
+    return Date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def _first_index(start: Date, frequency: str, window_start: Date) -> int:
+    """Index of the first occurrence on or after window_start"""
+    if window_start <= start:
+        return 0
+    if frequency in FREQUENCY_DAYS:
+        step = FREQUENCY_DAYS[frequency]
+        return -(-(window_start - start).days // step)
+    index = (window_start.year - start.year) * 12 + window_start.month - start.month
+    return index if occurrence_date(start, frequency, index) >= window_start else index + 1
+
+
+def iter_occurrences(start: Date, rule: dict, window_start: Date, window_end: Date) -> Iterator[Tuple[int, Date]]:
+    """Yield (index, date) of the rule's occurrences from window_start to window_end (inclusive)"""
+    frequency = rule['frequency']
+    count: Optional[int] = rule.get('count')
+    end = min(window_end, parse_date(rule['until'])) if rule.get('until') else window_end
+
+    index = _first_index(start, frequency, window_start)
+    while count is None or index < count:
+        day = occurrence_date(start, frequency, index)
+        if day > end:
+            return
+        yield index, day
+        index += 1
+
+
+def is_occurrence(booking: dict, day: Date) -> bool:
+    """Whether the rule of a recurring booking has an occurrence on this (original) date"""
+    return any(True for _ in iter_occurrences(parse_date(booking['date']), booking['recurrence'], day, day))
+
+
+def occurrence(booking: dict, original: str, day: str, time: str, index: int = 0) -> dict:
+    """Calendar entry for one occurrence of a booking"""
+    return {
+        'bookingId': booking['bookingId'],
+        'customerId': booking.get('customerId'),
+        'name': booking.get('name'),
+        'serviceName': booking.get('serviceName'),
+        'status': booking.get('status'),
+        'occurrenceDate': original,
+        'date': day,
+        'time': time,
+        'index': index,
+        'recurring': bool(booking.get('recurrence')),
+        'rescheduled': (day, time) != (original, booking['time']),
+    }
+
+
+def expand_booking(booking: dict, window_start: Date, window_end: Date) -> Iterator[dict]:
+    """Occurrences of a booking within the window, in (date, time) order, with exceptions applied"""
+    if not booking.get('recurrence'):
+        if window_start.isoformat() <= booking['date'] <= window_end.isoformat():
+            yield occurrence(booking, booking['date'], booking['date'], booking['time'])
+        return
+
+    start = parse_date(booking['date'])
+    rule = booking['recurrence']
+    exceptions = booking.get('recurrenceExceptions') or {}
+
+    def regular():
+        for index, day in iter_occurrences(start, rule, window_start, window_end):
+            original = day.isoformat()
+            if original not in exceptions:
+                yield occurrence(booking, original, original, booking['time'], index)
+
+    # Moved occurrences are few and stored - pick the ones that land in the window
+    moved = []
+    window = (window_start.isoformat(), window_end.isoformat())
+    for original, change in exceptions.items():
+        if change.get('skip') or not window[0] <= change.get('date', original) <= window[1]:
+            continue
+        day = parse_date(original)
+        for index, _ in iter_occurrences(start, rule, day, day):
+            moved.append(occurrence(booking, original, change.get('date', original),
+                                    change.get('time', booking['time']), index))
+    if not moved:
+        yield from regular()
+        return
+    moved.sort(key=occurrence_key)
+    yield from heapq.merge(regular(), moved, key=occurrence_key)
+
+
+def recurring_bookings_query(start: str, end: str) -> dict:
+    """Active recurring bookings that may have occurrences between start and end (ISO dates)"""
+    return {
+        'recurrence': {'$type': 'object'},
+        'status': {'$ne': 'cancelled'},
+        'date': {'$lte': end},
+        '$or': [{'recurrence.until': None}, {'recurrence.until': {'$gte': start}}],
+    }
+
+
+def occurrence_key(entry: dict) -> Tuple[str, str]:
+    return entry['date'], entry['time']
+
+
+def merge_occurrences(streams: Iterable[Iterable[dict]]) -> Iterator[dict]:
+    """Merge sorted occurrence streams (one per booking, or a sorted query) into one sorted stream"""
+    return heapq.merge(*streams, key=occurrence_key)
@@ -0,0 +1,72 @@
+"""
+Rebuild the customer_activity collection from existing bookings.
+Run once after deploying campaign segmentation (safe to re-run):
+  python backend/scripts/backfill_customer_activity.py
+It reads MONGO_URL and DB_NAME from environment.
+"""
+import os
+import sys
+from datetime import datetime
+from pymongo import MongoClient
+
+
+def main():
+    mongo_url = os.environ.get('MONGO_URL')
+    db_name = os.environ.get('DB_NAME', 'golden_touch_prod')
+
+    if not mongo_url:
+        print('Error: MONGO_URL not set in environment.')
+        sys.exit(1)
+
+    client = MongoClient(mongo_url)
+    db = client[db_name]
+
+    print(f'Backfilling customer_activity on database: {db_name}')
+
+    # $merge on email requires a unique index
+    db.customer_activity.create_index([('email', 1)], unique=True)
+
+    active = {'$ne': ['$status', 'cancelled']}
+    completed = {'$eq': ['$status', 'completed']}
+
+    db.bookings.aggregate([
+        {'$match': {'email': {'$nin': [None, '']}}},
+        {'$sort': {'createdAt': 1}},
+        {'$group': {
+            '_id': {'$toLower': {'$trim': {'input': '$email'}}},
+            'name': {'$last': '$name'},
+            'lastBookingDate': {'$max': '$date'},
+            # Service IDs of line items, or `service` for bookings stored before line items
+            'serviceLists': {'$addToSet': {'$cond': [
+                {'$gt': [{'$size': {'$ifNull': ['$items', []]}}, 0]}, '$items.service', ['$service']
+            ]}},
+            'bookingCount': {'$sum': {'$cond': [active, 1, 0]}},
+            'completedCount': {'$sum': {'$cond': [completed, 1, 0]}},
+            'lastCompletedDate': {'$max': {'$cond': [completed, '$date', None]}},
+        }},
+        {'$project': {
+            '_id': 0,
+            'email': '$_id',
+            'name': 1,
+            'lastBookingDate': 1,
+            'services': {'$reduce': {
+                'input': '$serviceLists', 'initialValue': [], 'in': {'$setUnion': ['$$value', '$$this']}
+            }},
+            'bookingCount': 1,
+            'completedCount': 1,
+            'lastCompletedDate': 1,
+            'updatedAt': datetime.utcnow().isoformat(),
+        }},
+        {'$merge': {
+            'into': 'customer_activity',
+            'on': 'email',
+            'whenMatched': 'replace',
+            'whenNotMatched': 'insert',
+        }},
+    ])
+
+    print(f'customer_activity now has {db.customer_activity.count_documents({})} records.')
+
+
+if __name__ == '__main__':
+    main()
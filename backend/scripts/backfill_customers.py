@@ -0,0 +1,87 @@
+"""
+Build the customers collection from existing bookings.
+Each customer keeps the customer ID of their earliest booking (or gets a
+new one if that ID is already taken by someone else), and all of their
+bookings are updated to it. Safe to re-run:
+  python backend/scripts/backfill_customers.py
+It reads MONGO_URL and DB_NAME from environment.
+"""
+import os
+import sys
+from pathlib import Path
+from pymongo import MongoClient, UpdateMany
+from pymongo.errors import DuplicateKeyError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from customers import customer_key  # noqa: E402
+from models import generate_customer_id  # noqa: E402
+from suppression import normalize_email  # noqa: E402
+
+
+def main():
+    mongo_url = os.environ.get('MONGO_URL')
+    db_name = os.environ.get('DB_NAME', 'golden_touch_prod')
+
+    if not mongo_url:
+        print('Error: MONGO_URL not set in environment.')
+        sys.exit(1)
+
+    client = MongoClient(mongo_url)
+    db = client[db_name]
+
+    print(f'Backfilling customers on database: {db_name}')
+
+    db.customers.create_index([('key', 1)], unique=True)
+    db.customers.create_index([('customerId', 1)], unique=True)
+
+    # key -> customer record, built from bookings oldest first
+    customers = {}
+    projection = {'_id': 0, 'bookingId': 1, 'name': 1, 'email': 1, 'phone': 1, 'customerId': 1, 'createdAt': 1}
+    for booking in db.bookings.find({}, projection).sort('createdAt', 1):
+        key = customer_key(booking.get('email'), booking.get('phone'))
+        if key is None:
+            continue
+        customer = customers.setdefault(key, {
+            'key': key,
+            'customerId': booking.get('customerId') or generate_customer_id(),
+            'firstBookingAt': booking.get('createdAt'),
+            'createdAt': booking.get('createdAt'),
+            'bookingCount': 0,
+            'bookingIds': [],
+        })
+        customer.update({
+            'name': booking.get('name'),
+            'phone': booking.get('phone'),
+            'email': normalize_email(booking.get('email')) or None,
+            'lastBookingAt': booking.get('createdAt'),
+            'updatedAt': booking.get('createdAt'),
+        })
+        customer['bookingCount'] += 1
+        customer['bookingIds'].append(booking['bookingId'])
+
+    updates = []
+    for key, customer in customers.items():
+        booking_ids = customer.pop('bookingIds')
+        existing = db.customers.find_one({'key': key}, {'customerId': 1})
+        if existing:
+            customer['customerId'] = existing['customerId']
+        while True:
+            try:
+                db.customers.update_one({'key': key}, {'$set': customer}, upsert=True)
+                break
+            except DuplicateKeyError:
+                # Legacy IDs were random - this one already belongs to another customer
+                customer['customerId'] = generate_customer_id()
+        updates.append(UpdateMany(
+            {'bookingId': {'$in': booking_ids}},
+            {'$set': {'customerId': customer['customerId']}}
+        ))
+
+    if updates:
+        db.bookings.bulk_write(updates, ordered=False)
+
+    print(f'customers now has {db.customers.count_documents({})} records.')
+
+
+if __name__ == '__main__':
+    main()
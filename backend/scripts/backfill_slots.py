@@ -0,0 +1,51 @@
+"""
+Rebuild slot counts (the slots collection) from existing bookings.
+Every slot gets the number of its bookings that are not cancelled; run it
+once before setting BOOKING_SLOT_CAPACITY, and again to repair counts:
+  python backend/scripts/backfill_slots.py
+It reads MONGO_URL and DB_NAME from environment.
+"""
+import os
+import sys
+from pathlib import Path
+from pymongo import MongoClient, UpdateOne
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from slots import slot_id  # noqa: E402
+
+
+def main():
+    mongo_url = os.environ.get('MONGO_URL')
+    db_name = os.environ.get('DB_NAME', 'golden_touch_prod')
+
+    if not mongo_url:
+        print('Error: MONGO_URL not set in environment.')
+        sys.exit(1)
+
+    client = MongoClient(mongo_url)
+    db = client[db_name]
+
+    print(f'Backfilling slot counts on database: {db_name}')
+
+    counts = db.bookings.aggregate([
+        {'$match': {'status': {'$ne': 'cancelled'}}},
+        {'$group': {'_id': {'date': '$date', 'time': '$time'}, 'booked': {'$sum': 1}}},
+    ])
+    updates = {}
+    for slot in counts:
+        date, time = slot['_id']['date'], slot['_id']['time']
+        updates[slot_id(date, time)] = UpdateOne(
+            {'_id': slot_id(date, time)},
+            {'$set': {'date': date, 'time': time, 'booked': slot['booked']}},
+            upsert=True
+        )
+    # Slots whose bookings were all cancelled or removed
+    db.slots.update_many({'_id': {'$nin': list(updates)}}, {'$set': {'booked': 0}})
+    if updates:
+        db.slots.bulk_write(list(updates.values()), ordered=False)
+
+    print(f'slots now has {db.slots.count_documents({})} records.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark booking input validation.
+
+Compares bookings validated per second by BookingCreate (validators run
+while the body is parsed) with the previous path: parse, model_dump(),
+validate_booking_input() on the dict, then model_dump() again.
+Run:
+  python backend/scripts/bench_booking_validation.py [bookings]
+"""
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel, EmailStr
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from models import BookingCreate  # noqa: E402
+
+PAYLOAD = {
+    'name': 'Jane Doe',
+    'email': 'jane@example.com',
+    'phone': '(403) 555-0123',
+    'address': '123 Main St SW, Calgary',
+    'service': '1',
+    'vehicleType': 'sedan',
+    'date': '2099-06-15',
+    'time': '10:00',
+    'notes': 'Parking in the back lane',
+    'promoCode': 'save10',
+}
+
+
+class LegacyBookingCreate(BaseModel):
+    """BookingCreate as it was, without validators"""
+    name: str
+    email: Optional[EmailStr] = None
+    phone: str
+    address: str
+    service: str
+    vehicleType: Optional[str] = None
+    date: str
+    time: str
+    notes: Optional[str] = None
+    promoCode: Optional[str] = None
+
+
+def legacy_sanitize_input(text: str) -> str:
+    if not text:
+        return text
+    text = re.sub(r'[<>"\']', '', text)
+    text = re.sub(r'javascript:', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'on\w+\s*=', '', text, flags=re.IGNORECASE)
+    return text.strip()
+
+
+def legacy_validate_booking_input(booking_data: dict) -> tuple[bool, str]:
+    """The previous validate_booking_input"""
+    required_fields = ['name', 'phone', 'address', 'service', 'date', 'time']
+    for field in required_fields:
+        if field not in booking_data or not booking_data[field]:
+            return False, f"Missing required field: {field}"
+    if booking_data.get('email'):
+        if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', booking_data['email']):
+            return False, "Invalid email format"
+    cleaned = re.sub(r'[\s\-\(\)]', '', booking_data['phone'])
+    if not re.match(r'^\+?[1-9]\d{9,14}$', cleaned):
+        return False, "Invalid phone number format"
+    for field in ['name', 'address', 'notes']:
+        if field in booking_data and booking_data[field]:
+            booking_data[field] = legacy_sanitize_input(booking_data[field])
+    try:
+        datetime.strptime(booking_data['date'], '%Y-%m-%d')
+    except ValueError:
+        return False, "Invalid date format. Use YYYY-MM-DD"
+    if datetime.strptime(booking_data['date'], '%Y-%m-%d').date() < datetime.now().date():
+        return False, "Cannot book dates in the past"
+    return True, "Valid"
+
+
+def legacy(payload: dict) -> dict:
+    booking_data = LegacyBookingCreate(**payload)
+    is_valid, message = legacy_validate_booking_input(booking_data.model_dump())
+    if not is_valid:
+        raise ValueError(message)
+    promo_code = legacy_sanitize_input(booking_data.promoCode).upper().strip()
+    booking_dict = booking_data.model_dump()
+    booking_dict['promoCode'] = promo_code
+    return booking_dict
+
+
+def current(payload: dict) -> dict:
+    return BookingCreate(**payload).model_dump()
+
+
+def bookings_per_second(validate, total: int) -> float:
+    for _ in range(1000):
+        validate(PAYLOAD)
+    began = time.perf_counter()
+    for _ in range(total):
+        validate(PAYLOAD)
+    return total / (time.perf_counter() - began)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    before = bookings_per_second(legacy, total)
+    after = bookings_per_second(current, total)
+    print(f"{'before':>12} {'after':>12} {'change':>8}   (bookings validated per second)")
+    print(f"{before:>12.0f} {after:>12.0f} {(after / before - 1) * 100:>7.0f}%")
+
+
+if __name__ == '__main__':
+    main()
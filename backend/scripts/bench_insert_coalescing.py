@@ -0,0 +1,138 @@
+"""
+Benchmark booking inserts with and without coalescing.
+
+Runs N concurrent clients, each inserting bookings back to back, through
+InsertCoalescer with coalescing off (one insert_one per booking) and on
+(insert_many per batch), and prints bookings per second for each
+concurrency level.
+With MONGO_URL set it writes to a scratch collection (dropped afterwards)
+on that server; otherwise it uses an in-process model of a connection
+pool and a server applying one write at a time (see SimulatedCollection).
+Run:
+  python backend/scripts/bench_insert_coalescing.py [--seconds 3] [--batch-ms 5] [--batch-size 100]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from bson import ObjectId
+from pymongo.results import InsertManyResult, InsertOneResult
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from write_coalescing import InsertCoalescer  # noqa: E402
+
+CONCURRENCY_LEVELS = (1, 10, 50, 200, 500)
+
+
+class SimulatedCollection:
+    """
+    Stands in for a collection: each write waits for one of `pool`
+    connections, spends `rtt` on the network and then `per_op` plus
+    `per_doc` per document in a server that applies writes one at a time.
+    """
+
+    def __init__(self, rtt: float, per_op: float, per_doc: float, pool: int):
+        self.rtt = rtt
+        self.per_op = per_op
+        self.per_doc = per_doc
+        self.connections = asyncio.Semaphore(pool)
+        self.server_free_at = 0.0  # when the server finishes the writes queued so far
+
+    async def _write(self, documents):
+        for document in documents:
+            document.setdefault('_id', ObjectId())
+        async with self.connections:
+            # Queue behind earlier writes on the server clock rather than with a
+            # lock, so event loop timer granularity does not add up per write
+            now = time.perf_counter()
+            self.server_free_at = max(now, self.server_free_at) + self.per_op + self.per_doc * len(documents)
+            await asyncio.sleep(self.server_free_at - now + self.rtt)
+
+    async def insert_one(self, document):
+        await self._write([document])
+        return InsertOneResult(document['_id'], True)
+
+    async def insert_many(self, documents, ordered=True):
+        await self._write(documents)
+        return InsertManyResult([document['_id'] for document in documents], True)
+
+
+def make_booking() -> dict:
+    now = datetime.utcnow().isoformat()
+    return {
+        'bookingId': str(uuid.uuid4()),
+        'name': 'Jane Doe',
+        'email': 'jane@example.com',
+        'phone': '(403) 555-0123',
+        'address': '123 Main St SW, Calgary',
+        'service': '1',
+        'serviceName': 'Basic Wash',
+        'date': '2099-06-15',
+        'time': '10:00',
+        'promoCode': 'GOLDY',
+        'discount': 30,
+        'status': 'pending',
+        'version': 1,
+        'createdAt': now,
+        'updatedAt': now,
+    }
+
+
+async def run(inserts: InsertCoalescer, concurrency: int, seconds: float) -> float:
+    done = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            await inserts.insert_one(make_booking())
+            done += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return done / (time.perf_counter() - start)
+
+
+async def main(args):
+    mongo_client = None
+    if os.environ.get('MONGO_URL'):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        mongo_client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        collection = mongo_client[os.environ.get('DB_NAME', 'golden_touch_prod')]['bench_booking_inserts']
+        print(f"MongoDB at {os.environ['MONGO_URL']}")
+    else:
+        collection = SimulatedCollection(args.rtt_ms / 1000, args.op_us / 1e6, args.doc_us / 1e6, args.pool)
+        print(f"Simulated collection: {args.rtt_ms}ms round trip, {args.op_us}us per write "
+              f"+ {args.doc_us}us per document, {args.pool} connections")
+
+    print(f"Coalescing: {args.batch_ms}ms / {args.batch_size} documents, {args.seconds}s per run\n")
+    print(f"{'clients':>8} {'insert_one/s':>14} {'coalesced/s':>14} {'speedup':>8}")
+    try:
+        for concurrency in CONCURRENCY_LEVELS:
+            single = await run(InsertCoalescer(collection), concurrency, args.seconds)
+            batched = await run(
+                InsertCoalescer(collection, max_delay=args.batch_ms / 1000, max_batch=args.batch_size),
+                concurrency, args.seconds
+            )
+            print(f"{concurrency:>8} {single:>14.0f} {batched:>14.0f} {batched / single:>7.1f}x")
+    finally:
+        if mongo_client is not None:
+            await collection.drop()
+            mongo_client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark booking insert coalescing')
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--batch-ms', type=float, default=5)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--rtt-ms', type=float, default=1.0, help='simulated round trip (no MONGO_URL)')
+    parser.add_argument('--op-us', type=float, default=200, help='simulated per-write server cost (no MONGO_URL)')
+    parser.add_argument('--doc-us', type=float, default=20, help='simulated per-document cost (no MONGO_URL)')
+    parser.add_argument('--pool', type=int, default=100, help='simulated connection pool size (no MONGO_URL)')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+"""
+Benchmark the security middleware stack.
+
+Drives an app with /api/ and /api/bookings routes directly through ASGI
+(no sockets), once with the previous two app.middleware("http") layers
+and once with SecurityMiddleware, and prints requests per second.
+Run:
+  python backend/scripts/bench_middleware.py [requests]
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import security  # noqa: E402
+from rate_limit import RateLimitPolicies, RateLimitPolicy  # noqa: E402
+from security import (  # noqa: E402
+    SecurityMiddleware, SECURITY_HEADERS, RATE_LIMIT_POLICIES, check_ip_blocked, check_rate_limit
+)
+
+BOOKINGS = [
+    {'bookingId': f'GT-{i:06d}', 'name': 'Jane Doe', 'service': 'full-detail',
+     'date': '2026-01-01', 'time': '10:00', 'status': 'pending'}
+    for i in range(20)
+]
+
+
+async def legacy_rate_limit_middleware(request: Request, call_next):
+    """The previous rate limit middleware"""
+    client_ip = request.client.host
+    if check_ip_blocked(client_ip):
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"detail": "Too many requests. Your IP has been temporarily blocked."}
+        )
+    if not await check_rate_limit(client_ip):
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"detail": "Rate limit exceeded. Please try again later."}
+        )
+    return await call_next(request)
+
+
+async def legacy_security_headers_middleware(request: Request, call_next):
+    """The previous security headers middleware"""
+    response = await call_next(request)
+    for name, value in SECURITY_HEADERS:
+        response.headers[name.decode()] = value.decode()
+    return response
+
+
+def use_permissive_policies():
+    """
+    Swap in the production rule table with limits no benchmark reaches, so
+    every request is counted (exempt routes included) but never gets a 429
+    """
+    unlimited = 10 ** 9
+    security.DEFAULT_RATE_LIMIT = RateLimitPolicy('req', unlimited, security.RATE_LIMIT_WINDOW)
+    security.rate_limit_policies = RateLimitPolicies(
+        {pattern: RateLimitPolicy(policy.name if policy else 'req', unlimited, policy.window if policy else 60)
+         for pattern, policy in RATE_LIMIT_POLICIES.items()},
+        security.DEFAULT_RATE_LIMIT
+    )
+
+
+def build_app(legacy: bool) -> FastAPI:
+    app = FastAPI()
+    if legacy:
+        app.middleware("http")(legacy_rate_limit_middleware)
+        app.middleware("http")(legacy_security_headers_middleware)
+    else:
+        app.add_middleware(SecurityMiddleware)
+
+    @app.get("/api/")
+    async def root():
+        return {"message": "Hello World"}
+
+    @app.get("/api/bookings")
+    async def bookings():
+        return BOOKINGS
+
+    return app
+
+
+async def requests_per_second(app, path: str, total: int) -> float:
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': b'', 'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 8000),
+    }
+
+    async def send(message):
+        pass
+
+    async def request():
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Like a server: nothing more until the client disconnects
+            await asyncio.Event().wait()
+
+        await app(dict(scope), receive, send)
+
+    # Warm up
+    for _ in range(200):
+        await request()
+
+    began = time.perf_counter()
+    for _ in range(total):
+        await request()
+    return total / (time.perf_counter() - began)
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    # Measure middleware overhead, not 429s
+    use_permissive_policies()
+
+    print(f"{'path':<16} {'before rps':>12} {'after rps':>12} {'change':>8}")
+    for path in ('/api/', '/api/bookings'):
+        before = await requests_per_second(build_app(legacy=True), path, total)
+        after = await requests_per_second(build_app(legacy=False), path, total)
+        print(f"{path:<16} {before:>12.0f} {after:>12.0f} {(after / before - 1) * 100:>7.0f}%")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
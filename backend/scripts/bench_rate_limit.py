@@ -0,0 +1,92 @@
+"""
+Benchmark the rate limiter with many distinct client IPs.
+
+Feeds N distinct IPs (default 1,000,000) through the in-process limiter
+and prints the per-check latency and process RSS for every 100k IPs,
+next to the previous timestamp-list implementation. The current limiter
+should show flat latency and RSS that stops growing at
+RATE_LIMIT_MAX_TRACKED_IPS records. A second pass times checks for a
+single client sitting at its limit, where the old implementation
+rebuilt the whole timestamp list on every request.
+Run:
+  python backend/scripts/bench_rate_limit.py [N]
+"""
+import asyncio
+import gc
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from rate_limit import SharedRateLimiter  # noqa: E402
+
+CHUNK = 100000
+LIMIT = 100
+WINDOW = 60
+
+
+class LegacyRateLimiter:
+    """The previous implementation: a list of request timestamps per IP, never evicted"""
+
+    def __init__(self, limit: int, window: int):
+        self.limit = limit
+        self.window = window
+        self.requests = defaultdict(list)
+
+    async def allow(self, ip: str) -> bool:
+        now = time.time()
+        self.requests[ip] = [t for t in self.requests[ip] if now - t < self.window]
+        if len(self.requests[ip]) >= self.limit:
+            return False
+        self.requests[ip].append(now)
+        return True
+
+
+def rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def ip_for(i: int) -> str:
+    return f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" if i < 1 << 24 else f"11.0.0.{i}"
+
+
+async def run(name: str, limiter, total: int):
+    print(f"\n{name}")
+    print(f"{'ips':>10} {'ns/check':>10} {'rss MB':>8} {'tracked':>9}")
+    gc.collect()
+    for start in range(0, total, CHUNK):
+        began = time.perf_counter_ns()
+        for i in range(start, min(start + CHUNK, total)):
+            await limiter.allow(ip_for(i))
+        elapsed = time.perf_counter_ns() - began
+        tracked = len(getattr(limiter, 'counters', getattr(limiter, 'requests', ())))
+        print(f"{start + CHUNK:>10} {elapsed / CHUNK:>10.0f} {rss_mb():>8.1f} {tracked:>9}")
+
+
+async def run_hot(name: str, limiter, checks: int = CHUNK):
+    ip = '192.0.2.1'
+    for _ in range(LIMIT):
+        await limiter.allow(ip)
+    began = time.perf_counter_ns()
+    for _ in range(checks):
+        await limiter.allow(ip)
+    elapsed = time.perf_counter_ns() - began
+    print(f"{name:<40} {elapsed / checks:>8.0f} ns/check")
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    await run('sliding-window counter (LRU capped)', SharedRateLimiter(LIMIT, WINDOW), total)
+    await run('legacy timestamp lists', LegacyRateLimiter(LIMIT, WINDOW), total)
+
+    print(f"\none client at its limit of {LIMIT} requests")
+    await run_hot('sliding-window counter (LRU capped)', SharedRateLimiter(LIMIT, WINDOW))
+    await run_hot('legacy timestamp lists', LegacyRateLimiter(LIMIT, WINDOW))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+Benchmark recurring booking expansion.
+
+Generates recurring bookings (weekly, bi-weekly and monthly, started up
+to three years ago, a few with exceptions) and times calendar queries of
+1, 7 and 31 days:
+  lazy   - expand_booking(), which jumps to the first occurrence in the window
+  naive  - walking every occurrence from the series start up to the window
+It also prints how many documents materializing two years of occurrences
+ahead would store instead.
+Run:
+  python backend/scripts/bench_recurrence.py [bookings]
+"""
+import random
+import sys
+import time
+import uuid
+from datetime import date as Date, timedelta
+from itertools import islice
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from recurrence import (  # noqa: E402
+    expand_booking, merge_occurrences, occurrence, occurrence_date, parse_date
+)
+
+TODAY = Date(2026, 1, 1)
+WINDOWS = (1, 7, 31)  # days
+QUERIES = 20
+MATERIALIZE_DAYS = 730
+
+
+def make_booking(rng: random.Random) -> dict:
+    start = TODAY - timedelta(days=rng.randrange(3 * 365))
+    booking = {
+        'bookingId': str(uuid.uuid4()),
+        'customerId': 'GT-BENCH',
+        'name': 'Jane Doe',
+        'serviceName': 'Weekly/Bi-Weekly/Monthly Cleaning',
+        'status': 'confirmed',
+        'date': start.isoformat(),
+        'time': rng.choice(['09:00', '11:00', '13:00', '15:00']),
+        'recurrence': {'frequency': rng.choice(['weekly', 'biweekly', 'monthly'])},
+        'recurrenceExceptions': {},
+    }
+    if rng.random() < 0.2:
+        skipped = occurrence_date(start, booking['recurrence']['frequency'], rng.randrange(1, 100))
+        booking['recurrenceExceptions'][skipped.isoformat()] = {'skip': True}
+    return booking
+
+
+def naive_expand(booking: dict, window_start: Date, window_end: Date):
+    """Walk the series from its first occurrence (exceptions left out for brevity)"""
+    start = parse_date(booking['date'])
+    frequency = booking['recurrence']['frequency']
+    index = 0
+    while True:
+        day = occurrence_date(start, frequency, index)
+        if day > window_end:
+            return
+        if day >= window_start:
+            yield occurrence(booking, day.isoformat(), day.isoformat(), booking['time'], index)
+        index += 1
+
+
+def run(bookings: list, expand, days: int) -> tuple:
+    occurrences = 0
+    started = time.perf_counter()
+    for query in range(QUERIES):
+        window_start = TODAY + timedelta(days=query * 3)
+        window_end = window_start + timedelta(days=days - 1)
+        streams = [expand(booking, window_start, window_end) for booking in bookings]
+        occurrences += sum(1 for _ in islice(merge_occurrences(streams), 1_000_000))
+    elapsed = time.perf_counter() - started
+    return elapsed / QUERIES * 1000, occurrences // QUERIES
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rng = random.Random(42)
+    bookings = [make_booking(rng) for _ in range(count)]
+    print(f"{count} recurring bookings, {QUERIES} queries per window\n")
+    print(f"{'window':>7} {'occurrences':>12} {'lazy ms':>9} {'naive ms':>9} {'speedup':>8}")
+    for days in WINDOWS:
+        lazy_ms, occurrences = run(bookings, expand_booking, days)
+        naive_ms, _ = run(bookings, naive_expand, days)
+        print(f"{days:>5}d {occurrences:>12} {lazy_ms:>9.1f} {naive_ms:>9.1f} {naive_ms / lazy_ms:>7.1f}x")
+
+    horizon = TODAY + timedelta(days=MATERIALIZE_DAYS)
+    materialized = sum(
+        sum(1 for _ in expand_booking(booking, parse_date(booking['date']), horizon)) for booking in bookings
+    )
+    print(f"\nMaterializing occurrences through {horizon} would store {materialized} documents "
+          f"({materialized / count:.0f} per booking); lazy expansion stores {count}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,18 @@
 """
 Simple script to create recommended MongoDB indexes.
+The application also ensures these indexes in the background at startup.
 Run:
   python backend/scripts/create_indexes.py
 It reads MONGO_URL and DB_NAME from environment or you can pass them via args.
 """
 import os
 import sys
+from pathlib import Path
 from pymongo import MongoClient
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from indexes import INDEXES  # noqa: E402
+
 
 def main():
     mongo_url = os.environ.get('MONGO_URL')
@@ -22,18 +27,10 @@ def main():
 
     print(f'Creating indexes on database: {db_name}')
 
-    # bookings indexes
-    db.bookings.create_index([('bookingId', 1)], unique=True)
-    db.bookings.create_index([('email', 1)])
-    db.bookings.create_index([('customerId', 1)])
-
-    # sessions indexes
-    db.sessions.create_index([('token', 1)], unique=True)
-    # expireAfterSeconds requires a TTL index on a date field
-    db.sessions.create_index([('expires_at', 1)], expireAfterSeconds=0)
-
-    # status_checks
-    db.status_checks.create_index([('timestamp', 1)])
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            db[collection].create_index(keys, **options)
+            print(f'  {collection}: {keys} {options or ""}')
 
     print('Indexes created successfully.')
 
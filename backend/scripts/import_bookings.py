@@ -0,0 +1,61 @@
+"""
+Bulk import bookings from a CSV or NDJSON file.
+Run:
+  python backend/scripts/import_bookings.py bookings.csv [--format csv|ndjson] [--notify]
+The format defaults to the file extension; --notify sends confirmation emails.
+It reads MONGO_URL and DB_NAME from environment.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from booking_import import set_import_db, import_bookings, IMPORT_FORMATS  # noqa: E402
+from customer_activity import set_activity_db  # noqa: E402
+from customers import set_customers_db  # noqa: E402
+from slots import set_slots_db  # noqa: E402
+from suppression import set_suppression_db  # noqa: E402
+
+READ_SIZE = 1024 * 1024  # bytes
+
+
+async def read_file(path: Path):
+    with path.open('rb') as f:
+        while chunk := f.read(READ_SIZE):
+            yield chunk
+
+
+async def run(path: Path, fmt: str, notify: bool):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'golden_touch_prod')]
+    for set_db in (set_import_db, set_customers_db, set_activity_db, set_suppression_db, set_slots_db):
+        set_db(db)
+    try:
+        return await import_bookings(read_file(path), fmt, notify=notify)
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import bookings')
+    parser.add_argument('file', type=Path)
+    parser.add_argument('--format', choices=IMPORT_FORMATS)
+    parser.add_argument('--notify', action='store_true', help='send confirmation emails')
+    args = parser.parse_args()
+
+    if not os.environ.get('MONGO_URL'):
+        print('Error: MONGO_URL not set in environment.')
+        sys.exit(1)
+
+    fmt = args.format or ('csv' if args.file.suffix.lower() == '.csv' else 'ndjson')
+    report = asyncio.run(run(args.file, fmt, args.notify))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
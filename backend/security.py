@@ -3,24 +3,38 @@ Security middleware and utilities for the application
 """
 import os
 import time
+import asyncio
 import secrets
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from collections import defaultdict
 from fastapi import HTTPException, Request, status
 from fastapi.responses import JSONResponse
 import logging
 import re
+import hashlib
+import jwt
+from collections import OrderedDict
+from typing import Optional
 from passlib.context import CryptContext
+from pymongo import UpdateOne, CursorType
+from pymongo.errors import CollectionInvalid
+from rate_limit import SharedRateLimiter, RateLimitPolicy, RateLimitPolicies
 
 logger = logging.getLogger(__name__)
 
 # Password hashing context using bcrypt
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# Rate limiting storage
-rate_limit_storage = defaultdict(list)
-login_attempts = defaultdict(list)
-blocked_ips = {}
+# bcrypt runs in a small dedicated pool so it never blocks the event loop.
+# Checks beyond BCRYPT_MAX_PENDING are rejected instead of queued, so a
+# login flood cannot build an unbounded backlog.
+BCRYPT_MAX_WORKERS = int(os.environ.get('BCRYPT_MAX_WORKERS', 2))
+BCRYPT_MAX_PENDING = int(os.environ.get('BCRYPT_MAX_PENDING', 16))
+bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_MAX_WORKERS, thread_name_prefix='bcrypt')
+_bcrypt_pending = 0
+
+# Admin password hash, computed once (or taken pre-hashed from ADMIN_PASSWORD_HASH)
+admin_password_hash = None
 
 # Security configurations
 MAX_LOGIN_ATTEMPTS = 5
@@ -29,6 +43,34 @@ BLOCK_DURATION = 900  # 15 minutes
 RATE_LIMIT_REQUESTS = 100  # requests per window
 RATE_LIMIT_WINDOW = 60  # 1 minute
 
+# Rate limiting and IP blocks, shared across workers (see rate_limit.py)
+rate_limiter = SharedRateLimiter(RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW)
+
+# Per-route limits: "[METHOD ]path" or "[METHOD ]prefix/*" -> policy (None = not limited).
+# Routes without a rule get DEFAULT_RATE_LIMIT.
+DEFAULT_RATE_LIMIT = RateLimitPolicy('req', RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW)
+RATE_LIMIT_POLICIES = {
+    # Health checks and metrics scraping
+    '/api/': None,
+    'GET /api/metrics': None,
+    # Brute-force targets
+    'POST /api/admin/login': RateLimitPolicy('login', 10, 60),
+    'POST /api/validate-promo': RateLimitPolicy('promo', 20, 60),
+    'GET /api/customers/lookup': RateLimitPolicy('customer_lookup', 20, 60),
+    # Mail clients and image proxies open pixels and links for many recipients from one IP
+    'GET /api/track/*': RateLimitPolicy('tracking', 2000, 60),
+    '/api/unsubscribe/*': RateLimitPolicy('unsubscribe', 300, 60),
+    # Booking form and calendar reads of slots and recurring occurrences
+    'GET /api/availability': RateLimitPolicy('availability', 300, 60),
+    'GET /api/bookings/calendar': RateLimitPolicy('occurrences', 600, 60),
+    # Admin dashboard polling
+    'GET /api/bookings': RateLimitPolicy('admin_read', 600, 60),
+    'GET /api/campaigns': RateLimitPolicy('admin_read', 600, 60),
+    'GET /api/campaigns/*': RateLimitPolicy('admin_read', 600, 60),
+    'GET /api/admin/*': RateLimitPolicy('admin_read', 600, 60),
+}
+rate_limit_policies = RateLimitPolicies(RATE_LIMIT_POLICIES, DEFAULT_RATE_LIMIT)
+
 
 def hash_password(password: str) -> str:
     """Hash password using bcrypt"""
@@ -40,176 +82,183 @@ def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
 
 
+async def run_bcrypt(func, *args):
+    """Run a bcrypt operation in the bounded pool"""
+    global _bcrypt_pending
+    if _bcrypt_pending >= BCRYPT_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress. Please try again shortly."
+        )
+
+    _bcrypt_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(bcrypt_executor, func, *args)
+    finally:
+        _bcrypt_pending -= 1
+
+
+async def init_admin_password_hash():
+    """Load the admin password hash once at startup"""
+    global admin_password_hash
+    configured_hash = os.environ.get('ADMIN_PASSWORD_HASH')
+    if configured_hash:
+        if not pwd_context.identify(configured_hash):
+            raise RuntimeError("ADMIN_PASSWORD_HASH is not a valid bcrypt hash")
+        admin_password_hash = configured_hash
+        return
+
+    admin_password = os.environ.get('ADMIN_PASSWORD', 'Amasarpong2006')
+    admin_password_hash = await run_bcrypt(hash_password, admin_password)
+
+
+async def verify_admin_password(password: str) -> bool:
+    """Verify the admin password against the cached hash without blocking the event loop"""
+    if admin_password_hash is None:
+        await init_admin_password_hash()
+    return await run_bcrypt(verify_password, password, admin_password_hash)
+
+
 def generate_session_token() -> str:
     """Generate secure session token"""
     return secrets.token_urlsafe(32)
 
 
+# Input patterns, compiled once at import
+UNSAFE_CHARS_PATTERN = re.compile(r'[<>"\']')
+JAVASCRIPT_URL_PATTERN = re.compile(r'javascript:', re.IGNORECASE)
+EVENT_HANDLER_PATTERN = re.compile(r'on\w+\s*=', re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PHONE_SEPARATORS_PATTERN = re.compile(r'[\s\-\(\)]')
+PHONE_PATTERN = re.compile(r'^\+?[1-9]\d{9,14}$')
+
+
 def sanitize_input(text: str) -> str:
     """Sanitize user input to prevent XSS and injection attacks"""
     if not text:
         return text
     
     # Remove potentially dangerous characters and patterns
-    text = re.sub(r'[<>"\']', '', text)
-    text = re.sub(r'javascript:', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'on\w+\s*=', '', text, flags=re.IGNORECASE)
+    text = UNSAFE_CHARS_PATTERN.sub('', text)
+    text = JAVASCRIPT_URL_PATTERN.sub('', text)
+    text = EVENT_HANDLER_PATTERN.sub('', text)
     
     return text.strip()
 
 
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return EMAIL_PATTERN.match(email) is not None
 
 
 def validate_phone(phone: str) -> bool:
     """Validate phone format"""
     # Remove common formatting characters
-    cleaned = re.sub(r'[\s\-\(\)]', '', phone)
+    cleaned = PHONE_SEPARATORS_PATTERN.sub('', phone)
     # Check if it's a valid phone number (10-15 digits)
-    return bool(re.match(r'^\+?[1-9]\d{9,14}$', cleaned))
+    return PHONE_PATTERN.match(cleaned) is not None
+
+
+def normalize_phone(phone: str) -> str:
+    """Reduce a phone number to its digits (and leading +) for lookups"""
+    return PHONE_SEPARATORS_PATTERN.sub('', phone or '')
 
 
 def check_ip_blocked(ip: str) -> bool:
-    """Check if IP is blocked"""
-    if ip in blocked_ips:
-        if time.time() < blocked_ips[ip]:
-            return True
-        else:
-            # Block expired, remove it
-            del blocked_ips[ip]
-    return False
-
-
-def block_ip(ip: str):
-    """Block IP address for specified duration"""
-    blocked_ips[ip] = time.time() + BLOCK_DURATION
+    """Check if IP is blocked (on any worker)"""
+    return rate_limiter.is_blocked(ip)
+
+
+async def block_ip(ip: str):
+    """Block IP address for specified duration on every worker"""
+    await rate_limiter.block(ip, BLOCK_DURATION)
     logger.warning(f"IP {ip} has been blocked for {BLOCK_DURATION} seconds")
 
 
-def check_rate_limit(ip: str) -> bool:
-    """Check if IP has exceeded rate limit"""
-    current_time = time.time()
-    
-    # Clean old entries
-    rate_limit_storage[ip] = [
-        req_time for req_time in rate_limit_storage[ip]
-        if current_time - req_time < RATE_LIMIT_WINDOW
-    ]
-    
-    # Check if exceeded
-    if len(rate_limit_storage[ip]) >= RATE_LIMIT_REQUESTS:
-        return False
-    
-    # Add current request
-    rate_limit_storage[ip].append(current_time)
-    return True
+async def check_rate_limit(ip: str, policy: Optional[RateLimitPolicy] = None) -> bool:
+    """Check if IP has exceeded rate limit (counted across all workers)"""
+    return await rate_limiter.allow(ip, policy or DEFAULT_RATE_LIMIT)
 
 
-def record_login_attempt(ip: str, success: bool) -> bool:
+async def record_login_attempt(ip: str, success: bool) -> bool:
     """
     Record login attempt and check for brute force
     Returns True if login should be allowed, False if blocked
     """
-    current_time = time.time()
-    
-    # Clean old attempts
-    login_attempts[ip] = [
-        (attempt_time, attempt_success) 
-        for attempt_time, attempt_success in login_attempts[ip]
-        if current_time - attempt_time < LOGIN_ATTEMPT_WINDOW
-    ]
-    
-    # Add current attempt
-    login_attempts[ip].append((current_time, success))
+    if success:
+        return True
     
-    # Count failed attempts in window
-    failed_attempts = sum(
-        1 for _, attempt_success in login_attempts[ip]
-        if not attempt_success
-    )
+    # Count failed attempts in window (shared across workers)
+    failed_attempts = await rate_limiter.count_event('login_failed', ip, LOGIN_ATTEMPT_WINDOW)
     
     # Block if too many failed attempts
     if failed_attempts >= MAX_LOGIN_ATTEMPTS:
-        block_ip(ip)
+        await block_ip(ip)
         logger.warning(f"IP {ip} blocked due to {failed_attempts} failed login attempts")
         return False
     
     return True
 
 
-async def rate_limit_middleware(request: Request, call_next):
-    """Middleware for rate limiting"""
-    client_ip = request.client.host
-    
-    # Check if IP is blocked
-    if check_ip_blocked(client_ip):
-        logger.warning(f"Blocked IP {client_ip} attempted to access {request.url.path}")
-        return JSONResponse(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            content={"detail": "Too many requests. Your IP has been temporarily blocked."}
-        )
-    
-    # Check rate limit
-    if not check_rate_limit(client_ip):
-        logger.warning(f"IP {client_ip} exceeded rate limit")
-        return JSONResponse(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            content={"detail": "Rate limit exceeded. Please try again later."}
-        )
-    
-    response = await call_next(request)
-    return response
+# Security headers added to every response, pre-encoded for the ASGI send path
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    (b"content-security-policy", b"default-src 'self'"),
+]
+SECURITY_HEADER_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
 
 
-def validate_booking_input(booking_data: dict) -> tuple[bool, str]:
-    """Validate booking input data"""
-    
-    # Required fields
-    required_fields = ['name', 'phone', 'address', 'service', 'date', 'time']
-    for field in required_fields:
-        if field not in booking_data or not booking_data[field]:
-            return False, f"Missing required field: {field}"
-    
-    # Validate email if provided
-    if booking_data.get('email'):
-        if not validate_email(booking_data['email']):
-            return False, "Invalid email format"
-    
-    # Validate phone
-    if not validate_phone(booking_data['phone']):
-        return False, "Invalid phone number format"
-    
-    # Sanitize text inputs
-    text_fields = ['name', 'address', 'notes']
-    for field in text_fields:
-        if field in booking_data and booking_data[field]:
-            booking_data[field] = sanitize_input(booking_data[field])
-    
-    # Validate date format
-    try:
-        datetime.strptime(booking_data['date'], '%Y-%m-%d')
-    except ValueError:
-        return False, "Invalid date format. Use YYYY-MM-DD"
-    
-    # Check if date is not in the past
-    booking_date = datetime.strptime(booking_data['date'], '%Y-%m-%d').date()
-    if booking_date < datetime.now().date():
-        return False, "Cannot book dates in the past"
-    
-    return True, "Valid"
-
+class SecurityMiddleware:
+    """
+    Raw ASGI middleware for IP blocks, rate limiting and security headers.
+    Replaces two BaseHTTPMiddleware layers, so requests are not wrapped in
+    extra tasks and response objects.
+    """
 
-def add_security_headers(response):
-    """Add security headers to response"""
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    response.headers["Content-Security-Policy"] = "default-src 'self'"
-    return response
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message['type'] == 'http.response.start':
+                # Replace (not duplicate) any of these headers the route already set
+                message['headers'] = [
+                    header for header in message.get('headers', ())
+                    if header[0].lower() not in SECURITY_HEADER_NAMES
+                ] + SECURITY_HEADERS
+            await send(message)
+
+        client_ip = scope['client'][0] if scope.get('client') else 'unknown'
+
+        # Check if IP is blocked
+        if check_ip_blocked(client_ip):
+            logger.warning(f"Blocked IP {client_ip} attempted to access {scope['path']}")
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Too many requests. Your IP has been temporarily blocked."}
+            )
+            await response(scope, receive, send_with_headers)
+            return
+
+        # Check rate limit (exempt routes have no policy)
+        policy = rate_limit_policies.match(scope['method'], scope['path'])
+        if policy is not None and not await check_rate_limit(client_ip, policy):
+            logger.warning(f"IP {client_ip} exceeded rate limit")
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Rate limit exceeded. Please try again later."}
+            )
+            await response(scope, receive, send_with_headers)
+            return
+
+        await self.app(scope, receive, send_with_headers)
 
 
 # Session management - will be initialized with MongoDB client
@@ -217,6 +266,32 @@ def add_security_headers(response):
 db_sessions = None
 SESSION_TIMEOUT = 3600  # 1 hour
 
+# Per-worker cache of validated sessions: token hash -> (expires_at, cached_until).
+# Logouts are broadcast to every worker through a capped collection; the
+# cache TTL bounds staleness if a broadcast is ever missed.
+SESSION_CACHE_TTL = 30  # seconds
+SESSION_CACHE_MAX_SIZE = 10000
+SESSION_ACTIVITY_FLUSH_INTERVAL = 15  # seconds
+SESSION_EVENTS_COLLECTION = 'session_events'
+SESSION_EVENTS_SIZE = 1024 * 1024  # bytes (capped collection)
+session_cache = OrderedDict()
+pending_activity = {}
+_session_tasks = []
+
+# Session mode: "mongo" (opaque tokens in the sessions collection) or "jwt"
+# (HMAC-signed stateless tokens checked against an in-memory revocation set)
+SESSION_MODE = os.environ.get('SESSION_MODE', 'mongo').lower()
+SESSION_SECRET = os.environ.get('SESSION_SECRET', '')
+JWT_ALGORITHM = 'HS256'
+if SESSION_MODE == 'jwt' and len(SESSION_SECRET) < 32:
+    raise RuntimeError("SESSION_MODE=jwt requires SESSION_SECRET of at least 32 characters")
+
+# Revoked JWT IDs -> expiry (unix time); loaded at startup and kept current by the broadcast.
+# Also reloaded periodically, which bounds staleness if a broadcast is missed
+# or the listener is down (like SESSION_CACHE_TTL in mongo mode).
+revoked_jtis = {}
+REVOKED_SESSIONS_RELOAD_INTERVAL = SESSION_CACHE_TTL  # seconds
+
 
 def set_sessions_db(database):
     """Set the database connection for session storage"""
@@ -226,6 +301,9 @@ def set_sessions_db(database):
 
 async def create_session(user_id: str) -> str:
     """Create a new session in MongoDB"""
+    if SESSION_MODE == 'jwt':
+        return create_jwt_session(user_id)
+    
     if db_sessions is None:
         raise RuntimeError("Database not initialized for sessions")
     
@@ -243,12 +321,104 @@ async def create_session(user_id: str) -> str:
     return token
 
 
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _cache_session(key: str, expires_at: datetime):
+    session_cache[key] = (expires_at, time.monotonic() + SESSION_CACHE_TTL)
+    session_cache.move_to_end(key)
+    while len(session_cache) > SESSION_CACHE_MAX_SIZE:
+        session_cache.popitem(last=False)
+
+
+def evict_session(key: str):
+    """Drop a session from this worker's cache"""
+    session_cache.pop(key, None)
+    pending_activity.pop(key, None)
+
+
+def create_jwt_session(user_id: str) -> str:
+    """Issue a signed stateless session token"""
+    now = int(time.time())
+    token = jwt.encode(
+        {'sub': user_id, 'jti': secrets.token_urlsafe(16), 'iat': now, 'exp': now + SESSION_TIMEOUT},
+        SESSION_SECRET,
+        algorithm=JWT_ALGORITHM
+    )
+    logger.info(f"Session created for user {user_id}")
+    return token
+
+
+def decode_jwt_session(token: str, verify_exp: bool = True) -> Optional[dict]:
+    """Verify a signed session token and return its claims, or None"""
+    try:
+        return jwt.decode(
+            token, SESSION_SECRET, algorithms=[JWT_ALGORITHM],
+            options={'require': ['exp', 'jti', 'sub'], 'verify_exp': verify_exp}
+        )
+    except jwt.InvalidTokenError:
+        return None
+
+
+def validate_jwt_session(token: str) -> bool:
+    """Validate a signed session token locally - no database access"""
+    claims = decode_jwt_session(token)
+    return claims is not None and claims['jti'] not in revoked_jtis
+
+
+def prune_revoked_jtis():
+    """Forget revocations of tokens that have expired anyway"""
+    now = time.time()
+    for jti in [jti for jti, exp in revoked_jtis.items() if exp < now]:
+        del revoked_jtis[jti]
+
+
+async def load_revoked_jtis():
+    """Load unexpired revocations from MongoDB into memory"""
+    cursor = db_sessions.revoked_sessions.find(
+        {'expires_at': {'$gt': datetime.utcnow()}}, {'jti': 1, 'exp': 1, '_id': 0}
+    )
+    async for doc in cursor:
+        revoked_jtis[doc['jti']] = doc['exp']
+
+
+async def revoke_jwt_session(token: str):
+    """Revoke a signed session token on every worker"""
+    claims = decode_jwt_session(token, verify_exp=False)
+    if claims is None or claims['exp'] < time.time():
+        return
+    
+    revoked_jtis[claims['jti']] = claims['exp']
+    await db_sessions.revoked_sessions.update_one(
+        {'jti': claims['jti']},
+        {'$set': {'exp': claims['exp'], 'expires_at': datetime.utcfromtimestamp(claims['exp'])}},
+        upsert=True
+    )
+    await broadcast_session_event({'type': 'revoke', 'jti': claims['jti'], 'exp': claims['exp']})
+    logger.info(f"Session revoked for user {claims['sub']}")
+
+
 async def validate_session(token: str) -> bool:
-    """Validate session token from MongoDB"""
+    """Validate session token, from the local cache when possible, else from MongoDB"""
+    if SESSION_MODE == 'jwt':
+        return validate_jwt_session(token)
+    
     if db_sessions is None:
         logger.error("Database not initialized for sessions")
         return False
     
+    key = _token_key(token)
+    now = datetime.utcnow()
+    
+    cached = session_cache.get(key)
+    if cached and cached[1] > time.monotonic() and now <= cached[0]:
+        session_cache.move_to_end(key)
+        # last_activity is written behind in batches
+        pending_activity[key] = (token, now)
+        return True
+    evict_session(key)
+    
     try:
         session = await db_sessions.sessions.find_one({'token': token})
         
@@ -256,30 +426,163 @@ async def validate_session(token: str) -> bool:
             return False
         
         # Check if session expired
-        if datetime.utcnow() > session['expires_at']:
+        if now > session['expires_at']:
             await db_sessions.sessions.delete_one({'token': token})
             return False
         
-        # Update last activity
-        await db_sessions.sessions.update_one(
-            {'token': token},
-            {'$set': {'last_activity': datetime.utcnow()}}
-        )
+        _cache_session(key, session['expires_at'])
+        pending_activity[key] = (token, now)
         return True
     except Exception as e:
         logger.error(f"Error validating session: {str(e)}")
         return False
 
 
+async def require_admin_session(request: Request):
+    """
+    Dependency for admin-only endpoints: the session token from login, as
+    "Authorization: Bearer <token>" or a token query parameter
+    """
+    authorization = request.headers.get('authorization', '')
+    if authorization.lower().startswith('bearer '):
+        token = authorization[7:].strip()
+    else:
+        token = request.query_params.get('token')
+    if not token or not await validate_session(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Admin session required"
+        )
+
+
+async def flush_session_activity():
+    """Write coalesced last_activity updates with a single bulk_write"""
+    if db_sessions is None or not pending_activity:
+        return
+    
+    batch = list(pending_activity.values())
+    pending_activity.clear()
+    try:
+        await db_sessions.sessions.bulk_write([
+            UpdateOne({'token': token}, {'$max': {'last_activity': last_activity}})
+            for token, last_activity in batch
+        ], ordered=False)
+    except Exception as e:
+        logger.error(f"Error flushing session activity: {str(e)}")
+
+
+async def broadcast_session_event(event: dict):
+    """Publish a session event (e.g. logout) to every worker"""
+    try:
+        await db_sessions[SESSION_EVENTS_COLLECTION].insert_one(
+            {**event, 'created_at': datetime.utcnow()}
+        )
+    except Exception as e:
+        logger.error(f"Error broadcasting session event: {str(e)}")
+
+
+def handle_session_event(event: dict):
+    """Apply a session event received from the broadcast"""
+    if event.get('type') == 'logout':
+        evict_session(event['key'])
+    elif event.get('type') == 'revoke':
+        revoked_jtis[event['jti']] = event['exp']
+
+
+async def _ensure_session_events_collection():
+    try:
+        await db_sessions.create_collection(
+            SESSION_EVENTS_COLLECTION, capped=True, size=SESSION_EVENTS_SIZE
+        )
+        # Tailable cursors on an empty capped collection die immediately
+        await db_sessions[SESSION_EVENTS_COLLECTION].insert_one({'type': 'init', 'created_at': datetime.utcnow()})
+    except CollectionInvalid:
+        pass
+    except Exception as e:
+        logger.error(f"Could not create {SESSION_EVENTS_COLLECTION}, logouts reach other workers "
+                     f"only after the {SESSION_CACHE_TTL}s cache TTL: {str(e)}")
+
+
+async def _tail_session_events():
+    """Follow the capped session_events collection and apply new events"""
+    last_id = None
+    while True:
+        try:
+            if last_id is None:
+                latest = await db_sessions[SESSION_EVENTS_COLLECTION].find_one(sort=[('$natural', -1)])
+                last_id = latest['_id'] if latest else None
+            query = {'_id': {'$gt': last_id}} if last_id else {}
+            cursor = db_sessions[SESSION_EVENTS_COLLECTION].find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                async for event in cursor:
+                    last_id = event['_id']
+                    handle_session_event(event)
+                await asyncio.sleep(0.1)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Session event stream error: {str(e)}")
+        await asyncio.sleep(1)
+
+
+async def _reload_revoked_jtis_periodically():
+    while True:
+        await asyncio.sleep(REVOKED_SESSIONS_RELOAD_INTERVAL)
+        try:
+            await load_revoked_jtis()
+        except Exception as e:
+            logger.error(f"Error reloading revoked sessions: {str(e)}")
+
+
+async def _flush_session_activity_periodically():
+    while True:
+        await asyncio.sleep(SESSION_ACTIVITY_FLUSH_INTERVAL)
+        await flush_session_activity()
+        prune_revoked_jtis()
+
+
+async def start_session_maintenance():
+    """Start the activity flusher and the logout broadcast listener"""
+    if db_sessions is None:
+        raise RuntimeError("Database not initialized for sessions")
+    
+    await _ensure_session_events_collection()
+    if SESSION_MODE == 'jwt':
+        await load_revoked_jtis()
+    loop = asyncio.get_running_loop()
+    _session_tasks.append(loop.create_task(_flush_session_activity_periodically()))
+    _session_tasks.append(loop.create_task(_tail_session_events()))
+    if SESSION_MODE == 'jwt':
+        _session_tasks.append(loop.create_task(_reload_revoked_jtis_periodically()))
+
+
+async def stop_session_maintenance():
+    """Stop background session tasks and flush pending activity"""
+    for task in _session_tasks:
+        task.cancel()
+    _session_tasks.clear()
+    await flush_session_activity()
+
+
 async def invalidate_session(token: str):
-    """Invalidate session (logout) - remove from MongoDB"""
+    """Invalidate session (logout) - remove from MongoDB and evict from every worker's cache"""
     if db_sessions is None:
         return
     
+    if SESSION_MODE == 'jwt':
+        try:
+            await revoke_jwt_session(token)
+        except Exception as e:
+            logger.error(f"Error revoking session: {str(e)}")
+        return
+    
+    key = _token_key(token)
+    evict_session(key)
     try:
         result = await db_sessions.sessions.delete_one({'token': token})
         if result.deleted_count > 0:
             logger.info(f"Session invalidated: {token}")
+        await broadcast_session_event({'type': 'logout', 'key': key})
     except Exception as e:
         logger.error(f"Error invalidating session: {str(e)}")
 
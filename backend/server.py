@@ -1,24 +1,67 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, ValidationError
 from typing import List, Optional
 import uuid
-from datetime import datetime, timezone
-from models import Booking, BookingCreate
+from datetime import date as Date, datetime, timezone
+from itertools import islice
+from catalog import PROMO_CODES, line_items, service_names
+from models import (
+    Booking, BookingCreate, BookingBatchGet, BookingBatchGetResponse, BulkStatusUpdate, Customer, ScheduleUpdate,
+    OccurrenceUpdate,
+    Campaign, CampaignCreate, CampaignUpdate, BOOKING_INPUT_ERROR, BOOKING_STATUSES, can_transition
+)
 from email_service import email_service
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
 from security import (
-    rate_limit_middleware, validate_booking_input, add_security_headers,
-    record_login_attempt, hash_password, verify_password, create_session, validate_session,
-    invalidate_session, sanitize_input, check_ip_blocked, set_sessions_db
+    SecurityMiddleware,
+    record_login_attempt, verify_admin_password, init_admin_password_hash, create_session, validate_session,
+    invalidate_session, sanitize_input, check_ip_blocked, set_sessions_db,
+    start_session_maintenance, stop_session_maintenance, clean_expired_sessions, rate_limiter,
+    require_admin_session
+)
+from suppression import (
+    set_suppression_db, add_suppression, verify_unsubscribe_token, require_unsubscribe_secret,
+    SUPPRESSION_REASONS, REASON_UNSUBSCRIBE
+)
+from booking_import import set_import_db, import_bookings, IMPORT_FORMATS
+from customers import set_customers_db, upsert_customer, get_customer, find_customer
+from customer_activity import (
+    set_activity_db, record_booking, record_status_change, record_status_changes, record_reschedule, SEGMENTS
+)
+from campaigns import (
+    scheduler, set_campaigns_db, start_campaign_scheduler, sync_campaigns, build_trigger, job_id,
+    MISFIRE_POLICIES
+)
+from email_campaign import TEMPLATES
+from metrics import render_metrics
+from open_tracking import open_tracker, open_events_total, TRANSPARENT_GIF
+from indexes import ensure_indexes, index_report
+from slots import (
+    set_slots_db, claim_slot, release_slot, adjust_slots, slot_delta, get_slot, get_day_slots, full_series_dates,
+    BOOKING_SLOT_CAPACITY
 )
+from recurrence import expand_booking, is_occurrence, merge_occurrences, occurrence, recurring_bookings_query
+from waitlist import (
+    set_waitlist_db, join_waitlist, waitlist_position, claim_next_waiter, finish_waiter, get_slot_waitlist,
+    get_waiting_entry, count_slot_waitlist
+)
+from write_coalescing import InsertCoalescer, BOOKING_INSERT_BATCH_MS, BOOKING_INSERT_BATCH_SIZE
+from idempotency import (
+    set_idempotency_db, booking_fingerprint, get_idempotent_booking, store_idempotent_booking,
+    find_booking_by_fingerprint, IDEMPOTENCY_KEY_HEADER, IDEMPOTENCY_KEY_MAX_LENGTH
+)
+from apscheduler.triggers.interval import IntervalTrigger
 
 # Configure logging
 logging.basicConfig(
@@ -39,55 +82,54 @@ db = client[os.environ['DB_NAME']]
 # Initialize sessions database for security module
 set_sessions_db(db)
 
+# Initialize suppression list database
+set_suppression_db(db)
+
+# Initialize customer records database
+set_customers_db(db)
+
+# Initialize bulk booking import database
+set_import_db(db)
+
+# Initialize customer activity database for campaign segmentation
+set_activity_db(db)
+
+# Initialize campaign definitions database
+set_campaigns_db(db)
+
+# Initialize idempotency keys and booking fingerprints database
+set_idempotency_db(db)
+
+# Initialize slot counts database
+set_slots_db(db)
+
+# Initialize waitlist database
+set_waitlist_db(db)
+
+# Booking inserts, batched under burst load when BOOKING_INSERT_BATCH_MS is set
+booking_inserts = InsertCoalescer(
+    db.bookings, max_delay=BOOKING_INSERT_BATCH_MS / 1000, max_batch=BOOKING_INSERT_BATCH_SIZE
+)
+
 # Create the main app without a prefix
 app = FastAPI()
 
-# Add security middleware
-app.middleware("http")(rate_limit_middleware)
+# Add security middleware (IP blocks, rate limiting, security headers)
+app.add_middleware(SecurityMiddleware)
 
-@app.middleware("http")
-async def add_security_headers_middleware(request: Request, call_next):
-    response = await call_next(request)
-    return add_security_headers(response)
+@app.exception_handler(RequestValidationError)
+async def booking_input_exception_handler(request: Request, exc: RequestValidationError):
+    """Return booking input errors (see BookingCreate) as a 400 with their message"""
+    for error in exc.errors():
+        if error['type'] == BOOKING_INPUT_ERROR:
+            client_ip = request.client.host if request.client else 'unknown'
+            logger.warning(f"Invalid booking input from {client_ip}: {error['msg']}")
+            return JSONResponse(status_code=400, content={"detail": error['msg']})
+    return await request_validation_exception_handler(request, exc)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Initialize scheduler for email campaigns
-scheduler = BackgroundScheduler()
-scheduler.start()
-logger.info("Email campaign scheduler started")
-
-# Services data (matching frontend)
-SERVICES = {
-    # Car Detailing Services
-    '1': 'Exterior Wash & Wax',
-    '2': 'Interior Detailing',
-    '3': 'Premium Full Detail',
-    '4': 'Engine Bay Cleaning',
-    
-    # Home & Property Cleaning Services
-    '5': 'House Cleaning Service',
-    '6': 'Move In/Move Out Cleaning',
-    '7': 'Deep Cleaning Service',
-    '8': 'Post Renovation Cleaning',
-    '9': 'AirBnB Cleaning Service',
-    '10': 'Office Cleaning Service',
-    '11': 'Seniors Cleaning Service',
-    '12': 'Weekly/Bi-Weekly/Monthly Cleaning'
-}
-
-# Promo codes with discounts (percentage)
-PROMO_CODES = {
-    'GOLDY': 30,
-    'SAVE10': 10,
-    'SAVE15': 15,
-    'SAVE20': 20,
-    'WELCOME25': 25,
-    'FIRSTTIME': 20,
-    'REFERRAL15': 15
-}
-
 # Define Models
 class StatusCheck(BaseModel):
     model_config = ConfigDict(extra="ignore")  # Ignore MongoDB's _id field
@@ -107,6 +149,11 @@ class StatusUpdate(BaseModel):
 async def root():
     return {"message": "Hello World"}
 
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """In-process metrics for this worker (Prometheus text format)"""
+    return render_metrics()
+
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.model_dump()
@@ -154,13 +201,10 @@ async def admin_login(login_data: AdminLogin, request: Request):
             detail="Too many failed login attempts. Please try again later."
         )
     
-    # Get admin password from environment
-    admin_password = os.environ.get('ADMIN_PASSWORD', 'Amasarpong2006')
-    
-    # Verify password using bcrypt
-    if not verify_password(login_data.password, hash_password(admin_password)):
+    # Verify password against the cached bcrypt hash (off the event loop)
+    if not await verify_admin_password(login_data.password):
         # Record failed login
-        allowed = record_login_attempt(client_ip, False)
+        allowed = await record_login_attempt(client_ip, False)
         
         if not allowed:
             logger.warning(f"IP {client_ip} blocked due to multiple failed login attempts")
@@ -176,7 +220,7 @@ async def admin_login(login_data: AdminLogin, request: Request):
         )
     
     # Record successful login
-    record_login_attempt(client_ip, True)
+    await record_login_attempt(client_ip, True)
     
     # Create session
     session_token = await create_session('admin')
@@ -203,6 +247,16 @@ async def validate_admin_session(token: str):
     is_valid = await validate_session(token)
     return {"valid": is_valid}
 
+# Index health report
+@api_router.get("/admin/index-report", dependencies=[Depends(require_admin_session)])
+async def get_index_report():
+    """List required indexes that are missing and existing indexes that look unused (admin only)"""
+    try:
+        return await index_report(db)
+    except Exception as e:
+        logger.error(f"Error building index report: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to build index report")
+
 # Promo code validation endpoint
 @api_router.post("/validate-promo")
 async def validate_promo_code(promo_data: dict):
@@ -223,51 +277,94 @@ async def validate_promo_code(promo_data: dict):
         }
 
 # Booking endpoints
+def build_booking_document(booking_data: BookingCreate, promo_code: Optional[str], discount: int):
+    """Booking model and MongoDB document for a validated request - one document for all services of the visit"""
+    booking_dict = booking_data.model_dump()
+    booking_dict['items'] = line_items(booking_data.services, promo_code)
+    booking_dict['serviceName'] = service_names(booking_dict['items'])
+    booking_dict['promoCode'] = promo_code
+    booking_dict['discount'] = discount
+    
+    booking = Booking(**booking_dict)
+    
+    # Convert to dict for MongoDB
+    booking_dict = booking.model_dump()
+    booking_dict['createdAt'] = booking_dict['createdAt'].isoformat()
+    booking_dict['updatedAt'] = booking_dict['updatedAt'].isoformat()
+    return booking, booking_dict
+
 @api_router.post("/bookings", response_model=Booking)
 async def create_booking(booking_data: BookingCreate, request: Request):
     """Create a new booking with security validation"""
     try:
         client_ip = request.client.host
-        logger.info(f"New booking request from {client_ip}: {booking_data.name} - {booking_data.service}")
-        
-        # Validate input
-        booking_dict = booking_data.model_dump()
-        is_valid, message = validate_booking_input(booking_dict)
+        logger.info(f"New booking request from {client_ip}: {booking_data.name} - {', '.join(booking_data.services)}")
         
-        if not is_valid:
-            logger.warning(f"Invalid booking input from {client_ip}: {message}")
-            raise HTTPException(status_code=400, detail=message)
+        # Answer retries of a request already handled under this Idempotency-Key
+        idempotency_key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise HTTPException(status_code=400, detail="Invalid Idempotency-Key header")
         
-        # Get service name from service ID
-        service_name = SERVICES.get(booking_data.service, booking_data.service)
+        fingerprint = booking_fingerprint(booking_data.model_dump())
+        if idempotency_key:
+            stored = await get_idempotent_booking(idempotency_key)
+            if stored:
+                if stored['fingerprint'] != fingerprint:
+                    raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different booking")
+                logger.info(f"Replaying booking {stored['response']['bookingId']} for Idempotency-Key from {client_ip}")
+                return Booking(**stored['response'])
         
+        # Input was already validated and sanitized by BookingCreate
         # Validate and apply promo code
         discount = 0
         promo_code = None
         if booking_data.promoCode:
-            promo_upper = sanitize_input(booking_data.promoCode).upper().strip()
-            if promo_upper in PROMO_CODES:
-                discount = PROMO_CODES[promo_upper]
-                promo_code = promo_upper
+            if booking_data.promoCode in PROMO_CODES:
+                discount = PROMO_CODES[booking_data.promoCode]
+                promo_code = booking_data.promoCode
                 logger.info(f"Valid promo code applied: {promo_code} - {discount}% discount for {booking_data.name}")
             else:
                 logger.warning(f"Invalid promo code attempted from {client_ip}: {booking_data.promoCode}")
         
-        # Create booking object
-        booking_dict = booking_data.model_dump()
-        booking_dict['serviceName'] = service_name
-        booking_dict['promoCode'] = promo_code
-        booking_dict['discount'] = discount
+        booking, booking_dict = build_booking_document(booking_data, promo_code, discount)
+        booking_dict['fingerprint'] = fingerprint
         
-        booking = Booking(**booking_dict)
+        if booking_data.recurrence:
+            # Later occurrences must fit too, not just the first date
+            full = await full_series_dates(booking.date, booking.time, booking_dict['recurrence'])
+            if full:
+                raise HTTPException(status_code=409, detail=f"This time slot is full on {', '.join(full[:5])}")
+        if not await claim_slot(booking.date, booking.time):
+            raise HTTPException(status_code=409, detail="This time slot is full")
         
-        # Convert to dict for MongoDB
-        booking_dict = booking.model_dump()
-        booking_dict['createdAt'] = booking_dict['createdAt'].isoformat()
-        booking_dict['updatedAt'] = booking_dict['updatedAt'].isoformat()
+        # Reuse the customer's ID (or create the customer) in one atomic upsert
+        customer_counted = False
+        try:
+            booking_dict['customerId'] = await upsert_customer(booking_dict)
+            booking.customerId = booking_dict['customerId']
+            customer_counted = True
+        except Exception as e:
+            logger.error(f"Failed to upsert customer for booking {booking.bookingId}: {str(e)}")
         
-        # Insert into database
-        result = await db.bookings.insert_one(booking_dict)
+        # Insert into database - the unique fingerprint index rejects repeat submissions
+        try:
+            result = await booking_inserts.insert_one(booking_dict)
+        except DuplicateKeyError:
+            await release_slot(booking.date, booking.time)
+            if customer_counted:
+                # The repeat submission did not add a booking for this customer
+                await db.customers.update_one({'customerId': booking.customerId}, {'$inc': {'bookingCount': -1}})
+            existing = await find_booking_by_fingerprint(fingerprint)
+            if not existing:
+                raise HTTPException(status_code=409, detail="Duplicate booking")
+            logger.info(f"Duplicate submission from {client_ip} answered with booking {existing['bookingId']}")
+            booking = Booking(**existing)
+            if idempotency_key:
+                await store_idempotent_booking(idempotency_key, fingerprint, booking.model_dump(mode='json'))
+            return booking
+        except Exception:
+            await release_slot(booking.date, booking.time)
+            raise
         
         if not result.inserted_id:
             logger.error(f"Failed to insert booking for {booking.bookingId}")
@@ -275,6 +372,18 @@ async def create_booking(booking_data: BookingCreate, request: Request):
         
         logger.info(f"Booking created successfully: {booking.bookingId} (Customer: {booking.customerId})")
         
+        if idempotency_key:
+            try:
+                await store_idempotent_booking(idempotency_key, fingerprint, booking.model_dump(mode='json'))
+            except Exception as e:
+                logger.error(f"Failed to store Idempotency-Key for booking {booking.bookingId}: {str(e)}")
+        
+        # Update precomputed customer activity for campaign segments
+        try:
+            await record_booking(booking_dict)
+        except Exception as e:
+            logger.error(f"Failed to update customer activity for booking {booking.bookingId}: {str(e)}")
+        
         # Send emails (non-blocking)
         try:
             await email_service.send_customer_confirmation(booking_dict)
@@ -291,6 +400,151 @@ async def create_booking(booking_data: BookingCreate, request: Request):
         logger.error(f"Error creating booking: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to create booking")
 
+# Waitlist
+async def promote_from_waitlist(date: str, time: str) -> Optional[str]:
+    """
+    Book the first waiter of a slot into the place that was just freed.
+    Called from the events that free a place (cancellation, reschedule);
+    returns the new booking ID, or None if nobody was waiting.
+    """
+    while True:
+        entry = await claim_next_waiter(date, time)
+        if entry is None:
+            return None
+        if not await claim_slot(date, time):
+            # Someone else booked the place first - keep the waiter's position
+            await finish_waiter(entry['waitlistId'], 'waiting')
+            return None
+        
+        try:
+            booking_data = BookingCreate(**{field: entry.get(field) for field in BookingCreate.model_fields})
+        except ValidationError:
+            # The slot is in the past by now
+            await release_slot(date, time)
+            await finish_waiter(entry['waitlistId'], 'expired')
+            return None
+        
+        discount = PROMO_CODES.get(booking_data.promoCode, 0)
+        booking, booking_dict = build_booking_document(booking_data, booking_data.promoCode if discount else None, discount)
+        booking_dict['fingerprint'] = booking_fingerprint(booking_dict)
+        customer_counted = False
+        try:
+            booking_dict['customerId'] = await upsert_customer(booking_dict)
+            customer_counted = True
+        except Exception as e:
+            logger.error(f"Failed to upsert customer for waitlist booking {booking.bookingId}: {str(e)}")
+        
+        try:
+            await booking_inserts.insert_one(booking_dict)
+        except DuplicateKeyError:
+            # The waiter has meanwhile booked this slot themselves - try the next one
+            await release_slot(date, time)
+            if customer_counted:
+                await db.customers.update_one({'customerId': booking_dict['customerId']}, {'$inc': {'bookingCount': -1}})
+            await finish_waiter(entry['waitlistId'], 'expired')
+            continue
+        except Exception:
+            await release_slot(date, time)
+            await finish_waiter(entry['waitlistId'], 'waiting')
+            raise
+        
+        await finish_waiter(entry['waitlistId'], 'promoted', booking.bookingId)
+        logger.info(f"Waitlist entry {entry['waitlistId']} promoted to booking {booking.bookingId} for {date} {time}")
+        
+        try:
+            await record_booking(booking_dict)
+        except Exception as e:
+            logger.error(f"Failed to update customer activity for booking {booking.bookingId}: {str(e)}")
+        
+        try:
+            await email_service.send_customer_confirmation(booking_dict)
+            await email_service.send_business_notification(booking_dict)
+        except Exception as e:
+            logger.error(f"Failed to send emails for waitlist booking {booking.bookingId}: {str(e)}")
+        return booking.bookingId
+
+async def promote_waiters(freed: dict):
+    """Promote waiters into places freed by status changes ({(date, time): places})"""
+    for (date, time), places in freed.items():
+        for _ in range(places):
+            try:
+                if not await promote_from_waitlist(date, time):
+                    break
+            except Exception as e:
+                logger.error(f"Failed to promote waitlist for {date} {time}: {str(e)}")
+                break
+
+@api_router.post("/waitlist")
+async def join_slot_waitlist(booking_data: BookingCreate):
+    """Join the waitlist of a full slot; the booking is made (and confirmed by email) when a place frees up"""
+    try:
+        slot = await get_slot(booking_data.date, booking_data.time)
+        if slot['remaining'] is None or slot['remaining'] > 0:
+            raise HTTPException(status_code=409, detail="This time slot is not full - book it directly")
+        
+        entry = await join_waitlist(booking_data.model_dump())
+        position = await waitlist_position(entry)
+        logger.info(f"Waitlist entry {entry['waitlistId']} for {booking_data.date} {booking_data.time} (position {position})")
+        return {"waitlistId": entry['waitlistId'], "date": entry['date'], "time": entry['time'], "position": position}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error joining waitlist: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to join waitlist")
+
+@api_router.get("/waitlist")
+async def get_waitlist(date: str, time: str, waitlistId: Optional[str] = None):
+    """
+    Public view of a slot's waitlist: how many are waiting and, for a
+    waitlistId of that slot, its position. No customer details.
+    """
+    try:
+        result = {"slot": await get_slot(date, time), "waiting": await count_slot_waitlist(date, time)}
+        if waitlistId:
+            entry = await get_waiting_entry(waitlistId)
+            if not entry or (entry['date'], entry['time']) != (date, time):
+                raise HTTPException(status_code=404, detail="Waitlist entry not found")
+            result["position"] = await waitlist_position(entry)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching waitlist for {date} {time}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch waitlist")
+
+@api_router.get("/admin/waitlist", dependencies=[Depends(require_admin_session)])
+async def get_admin_waitlist(date: str, time: str):
+    """Waiting entries of a slot with customer details, first in line first (admin only)"""
+    try:
+        return {"slot": await get_slot(date, time), "waiting": await get_slot_waitlist(date, time)}
+    except Exception as e:
+        logger.error(f"Error fetching waitlist for {date} {time}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch waitlist")
+
+@api_router.post("/bookings/import", dependencies=[Depends(require_admin_session)])
+async def import_bookings_endpoint(request: Request, format: Optional[str] = None, notify: bool = False):
+    """
+    Bulk import bookings from a CSV or NDJSON request body (admin only).
+    The format comes from ?format= or the Content-Type; emails are only sent with ?notify=true.
+    """
+    if format is None:
+        content_type = request.headers.get('content-type', '')
+        if 'csv' in content_type:
+            format = 'csv'
+        elif 'ndjson' in content_type or 'jsonl' in content_type:
+            format = 'ndjson'
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Must be one of: {', '.join(IMPORT_FORMATS)}"
+        )
+    
+    try:
+        return await import_bookings(request.stream(), format, notify=notify)
+    except Exception as e:
+        logger.error(f"Error importing bookings: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to import bookings")
+
 @api_router.get("/bookings", response_model=List[Booking])
 async def get_bookings(skip: int = 0, limit: int = 50):
     """Get all bookings with pagination"""
@@ -312,15 +566,85 @@ async def get_bookings(skip: int = 0, limit: int = 50):
         logger.error(f"Error fetching bookings: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch bookings")
 
+# Longest calendar window and most occurrences per calendar request
+MAX_CALENDAR_DAYS = 92
+MAX_CALENDAR_OCCURRENCES = 5000
+
+# Fields needed to expand bookings into calendar entries
+CALENDAR_PROJECTION = {
+    "_id": 0, "bookingId": 1, "customerId": 1, "name": 1, "serviceName": 1, "status": 1,
+    "date": 1, "time": 1, "recurrence": 1, "recurrenceExceptions": 1
+}
+
+def parse_query_date(value: str, name: str) -> Date:
+    try:
+        return Date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}. Use YYYY-MM-DD")
+
+@api_router.get("/bookings/calendar")
+async def get_booking_calendar(start: str, end: str, includeCancelled: bool = False):
+    """
+    Bookings between two dates (inclusive) as calendar entries in date/time order,
+    with the occurrences of recurring bookings expanded and merged in.
+    """
+    start_date = parse_query_date(start, "start")
+    end_date = parse_query_date(end, "end")
+    if not 0 <= (end_date - start_date).days < MAX_CALENDAR_DAYS:
+        raise HTTPException(status_code=400, detail=f"end must be on or after start, at most {MAX_CALENDAR_DAYS} days")
+    
+    try:
+        query = {"date": {"$gte": start, "$lte": end}, "recurrence": None}
+        if not includeCancelled:
+            query["status"] = {"$ne": "cancelled"}
+        # Enough one-off bookings to fill the response; the rest would sort after them
+        single = await db.bookings.find(query, CALENDAR_PROJECTION).sort(
+            [("date", 1), ("time", 1)]
+        ).to_list(MAX_CALENDAR_OCCURRENCES + 1)
+        recurring_query = recurring_bookings_query(start, end)
+        if includeCancelled:
+            del recurring_query["status"]
+        recurring = await db.bookings.find(recurring_query, CALENDAR_PROJECTION).to_list(None)
+        
+        streams = [(occurrence(b, b['date'], b['date'], b['time']) for b in single)]
+        streams.extend(expand_booking(b, start_date, end_date) for b in recurring)
+        entries = list(islice(merge_occurrences(streams), MAX_CALENDAR_OCCURRENCES + 1))
+        return {
+            "start": start,
+            "end": end,
+            "occurrences": entries[:MAX_CALENDAR_OCCURRENCES],
+            "truncated": len(entries) > MAX_CALENDAR_OCCURRENCES
+        }
+    except Exception as e:
+        logger.error(f"Error fetching calendar {start} - {end}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch calendar")
+
+@api_router.get("/availability")
+async def get_availability(date: str):
+    """Booked places per time on a date, counting the occurrences of recurring bookings"""
+    parse_query_date(date, "date")
+    try:
+        booked = await get_day_slots(date)
+        slots = []
+        for time in sorted(booked):
+            remaining = None if BOOKING_SLOT_CAPACITY is None else max(BOOKING_SLOT_CAPACITY - booked[time], 0)
+            slots.append({"time": time, "booked": booked[time], "remaining": remaining})
+        return {"date": date, "capacity": BOOKING_SLOT_CAPACITY, "slots": slots}
+    except Exception as e:
+        logger.error(f"Error fetching availability for {date}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch availability")
+
 @api_router.get("/bookings/{booking_id}", response_model=Booking)
-async def get_booking(booking_id: str):
-    """Get a specific booking by ID"""
+async def get_booking(booking_id: str, response: Response):
+    """Get a specific booking by ID (the ETag is its version, for If-Match on updates)"""
     try:
         booking = await db.bookings.find_one({"bookingId": booking_id}, {"_id": 0})
         
         if not booking:
             raise HTTPException(status_code=404, detail="Booking not found")
         
+        response.headers['ETag'] = f'"{booking.get("version", 1)}"'
+        
         # Convert ISO string timestamps back to datetime objects
         if isinstance(booking.get('createdAt'), str):
             booking['createdAt'] = datetime.fromisoformat(booking['createdAt'])
@@ -334,30 +658,280 @@ async def get_booking(booking_id: str):
         logger.error(f"Error fetching booking {booking_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch booking")
 
+# Most bookings a single batch-get may request
+MAX_BATCH_GET_IDS = 100
+
+@api_router.post("/bookings/batch-get", response_model=BookingBatchGetResponse)
+async def batch_get_bookings(request_data: BookingBatchGet):
+    """Get many bookings by ID with one query, in the order requested"""
+    booking_ids = list(dict.fromkeys(request_data.bookingIds))
+    if len(booking_ids) > MAX_BATCH_GET_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_GET_IDS} booking IDs per request")
+    
+    try:
+        found = {
+            booking['bookingId']: booking
+            for booking in await db.bookings.find(
+                {"bookingId": {"$in": booking_ids}}, {"_id": 0}
+            ).to_list(len(booking_ids))
+        }
+        
+        return {
+            "bookings": [found[booking_id] for booking_id in booking_ids if booking_id in found],
+            "missing": [booking_id for booking_id in booking_ids if booking_id not in found]
+        }
+    except Exception as e:
+        logger.error(f"Error fetching {len(booking_ids)} bookings: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch bookings")
+
+# Most bookings a single bulk status update may touch
+MAX_BULK_STATUS_UPDATES = 500
+
+@api_router.put("/bookings/status", dependencies=[Depends(require_admin_session)])
+async def bulk_update_booking_status(update: BulkStatusUpdate):
+    """Update the status of many bookings (by ID or filter) with one bulk_write (admin only)"""
+    status_value = update.status.lower().strip()
+    if status_value not in BOOKING_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid status. Must be one of: {', '.join(BOOKING_STATUSES)}"
+        )
+    if (update.bookingIds is None) == (update.filter is None):
+        raise HTTPException(status_code=400, detail="Provide either bookingIds or filter")
+    
+    try:
+        if update.bookingIds is not None:
+            booking_ids = list(dict.fromkeys(update.bookingIds))
+            if len(booking_ids) > MAX_BULK_STATUS_UPDATES:
+                raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_STATUS_UPDATES} bookings per update")
+            query = {"bookingId": {"$in": booking_ids}}
+        else:
+            query = update.filter.model_dump(exclude_none=True)
+            if not query:
+                raise HTTPException(status_code=400, detail="Filter must not be empty")
+            booking_ids = None
+        
+        # Current state of every booking, for outcomes and customer activity
+        projection = {"_id": 0, "bookingId": 1, "status": 1, "email": 1, "date": 1, "time": 1,
+                      "phone": 1, "service": 1, "services": 1}
+        current = {
+            booking['bookingId']: booking
+            for booking in await db.bookings.find(query, projection).to_list(MAX_BULK_STATUS_UPDATES + 1)
+        }
+        if booking_ids is None:
+            if len(current) > MAX_BULK_STATUS_UPDATES:
+                raise HTTPException(status_code=400, detail=f"Filter matches more than {MAX_BULK_STATUS_UPDATES} bookings")
+            booking_ids = list(current)
+        
+        results = {}
+        requests = []
+        changed = []
+        updated_at = datetime.utcnow().isoformat()
+        for booking_id in booking_ids:
+            booking = current.get(booking_id)
+            if booking is None:
+                results[booking_id] = {"bookingId": booking_id, "outcome": "not_found"}
+                continue
+            old_status = booking.get('status')
+            results[booking_id] = {"bookingId": booking_id, "previousStatus": old_status, "outcome": "updated"}
+            if old_status == status_value:
+                results[booking_id]["outcome"] = "unchanged"
+                continue
+            if not can_transition(old_status, status_value):
+                results[booking_id]["outcome"] = "invalid_transition"
+                continue
+            
+            change = {"$set": {"status": status_value, "updatedAt": updated_at}, "$inc": {"version": 1}}
+            if status_value == 'cancelled':
+                # Free the slot for a new booking by the same customer
+                change["$unset"] = {"fingerprint": ""}
+            elif old_status == 'cancelled':
+                # Reactivated - repeat submissions of it are rejected again
+                change["$set"]["fingerprint"] = booking_fingerprint(booking)
+            # Only apply if the status has not changed since it was read
+            requests.append(UpdateOne({"bookingId": booking_id, "status": old_status}, change))
+            changed.append(booking)
+        
+        if requests:
+            duplicates = set()
+            try:
+                matched_count = (await db.bookings.bulk_write(requests, ordered=False)).matched_count
+            except BulkWriteError as e:
+                # Reactivations whose fingerprint is taken by another active booking
+                errors = e.details.get('writeErrors', [])
+                if any(error.get('code') != 11000 for error in errors):
+                    raise
+                duplicates = {changed[error['index']]['bookingId'] for error in errors}
+                matched_count = e.details.get('nMatched', 0)
+            for booking_id in duplicates:
+                results[booking_id]["outcome"] = "duplicate"
+            if matched_count + len(duplicates) < len(requests):
+                # Some bookings changed concurrently - find out which ones we did not update
+                async for booking in db.bookings.find(
+                    {"bookingId": {"$in": [b['bookingId'] for b in changed]}},
+                    {"_id": 0, "bookingId": 1, "status": 1, "updatedAt": 1}
+                ):
+                    if booking['bookingId'] in duplicates:
+                        continue
+                    if booking.get('status') != status_value or booking.get('updatedAt') != updated_at:
+                        results[booking['bookingId']]["outcome"] = "conflict"
+            changed = [b for b in changed if results[b['bookingId']]["outcome"] == "updated"]
+        
+        logger.info(f"Bulk status update to {status_value}: {len(changed)} of {len(booking_ids)} bookings updated")
+        
+        slot_changes = {}
+        for booking in changed:
+            slot = (booking['date'], booking['time'])
+            slot_changes[slot] = slot_changes.get(slot, 0) + slot_delta(booking.get('status'), status_value)
+        try:
+            await adjust_slots(slot_changes)
+        except Exception as e:
+            logger.error(f"Failed to update slot counts for bulk status update: {str(e)}")
+        await promote_waiters({slot: -delta for slot, delta in slot_changes.items() if delta < 0})
+        
+        try:
+            await record_status_changes([(b, b.get('status'), status_value) for b in changed])
+        except Exception as e:
+            logger.error(f"Failed to update customer activity for bulk status update: {str(e)}")
+        
+        return {
+            "status": status_value,
+            "updated": len(changed),
+            "results": [results[booking_id] for booking_id in booking_ids]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in bulk status update: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to update bookings")
+
+def parse_if_match(value: Optional[str]) -> Optional[int]:
+    """Return the booking version from an If-Match header ("3", W/"3" or *), None for any version"""
+    if value is None or value.strip() == '*':
+        return None
+    value = value.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
+def version_condition(version: int):
+    """Query condition matching a booking version (documents without one are version 1)"""
+    return {"$in": [1, None]} if version == 1 else version
+
+async def reactivate_booking(booking: dict, status_value: str, updated_at: str) -> dict:
+    """
+    Move a cancelled booking back to an active status, restoring the
+    fingerprint that cancelling removed. Returns the previous document.
+    """
+    try:
+        result = await db.bookings.find_one_and_update(
+            {"bookingId": booking['bookingId'], "status": 'cancelled',
+             "version": version_condition(booking.get('version', 1))},
+            {"$set": {"status": status_value, "updatedAt": updated_at,
+                      "fingerprint": booking_fingerprint(booking)},
+             "$inc": {"version": 1}},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=409,
+            detail="The customer already has an active booking for this time and service"
+        )
+    if not result:
+        raise HTTPException(status_code=409, detail="Booking was modified by someone else")
+    return result
+
 @api_router.put("/bookings/{booking_id}/status", response_model=Booking)
-async def update_booking_status(booking_id: str, status_update: dict):
-    """Update booking status"""
+async def update_booking_status(booking_id: str, status_update: dict, request: Request, response: Response):
+    """
+    Update booking status.
+    With an If-Match header (or expectedVersion in the body) the update only
+    applies to that version of the booking, otherwise it returns 409.
+    """
     # Validate status value
-    valid_statuses = ['pending', 'confirmed', 'completed', 'cancelled']
     status_value = status_update.get('status', '').lower().strip()
     
-    if not status_value or status_value not in valid_statuses:
+    if not status_value or status_value not in BOOKING_STATUSES:
         raise HTTPException(
             status_code=400, 
-            detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
+            detail=f"Invalid status. Must be one of: {', '.join(BOOKING_STATUSES)}"
         )
     
+    expected_version = parse_if_match(request.headers.get('if-match'))
+    if expected_version is None and status_update.get('expectedVersion') is not None:
+        try:
+            expected_version = int(status_update['expectedVersion'])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid expectedVersion")
+    
     try:
+        updated_at = datetime.utcnow().isoformat()
+        # Compare-and-set in one round trip: the filter only matches an allowed
+        # transition (and the expected version, if given)
+        # Reactivating a cancelled booking needs its fingerprint back, which the
+        # fallback below computes from the document
+        query = {
+            "bookingId": booking_id,
+            "status": {"$in": [
+                s for s in BOOKING_STATUSES
+                if can_transition(s, status_value) and (s != 'cancelled' or status_value == 'cancelled')
+            ]}
+        }
+        if expected_version is not None:
+            query["version"] = version_condition(expected_version)
+        update = {"$set": {"status": status_value, "updatedAt": updated_at}, "$inc": {"version": 1}}
+        if status_value == 'cancelled':
+            # Free the slot for a new booking by the same customer
+            update["$unset"] = {"fingerprint": ""}
+        # Return the previous document so the status transition is known
         result = await db.bookings.find_one_and_update(
-            {"bookingId": booking_id},
-            {"$set": {"status": status_value, "updatedAt": datetime.utcnow().isoformat()}},
-            return_document=True
+            query,
+            update,
+            return_document=ReturnDocument.BEFORE
         )
         if not result:
-            raise HTTPException(status_code=404, detail="Booking not found")
+            # Find out why - only on the failure path
+            current = await db.bookings.find_one({"bookingId": booking_id}, {"_id": 0})
+            if not current:
+                raise HTTPException(status_code=404, detail="Booking not found")
+            current_version = current.get('version', 1)
+            if expected_version is not None and current_version != expected_version:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Booking was modified by someone else (now version {current_version})"
+                )
+            if current.get('status') != 'cancelled' or not can_transition('cancelled', status_value):
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Cannot change status from {current.get('status')} to {status_value}"
+                )
+            result = await reactivate_booking(current, status_value, updated_at)
+        
+        old_status = result.get('status')
+        result['status'] = status_value
+        result['updatedAt'] = updated_at
+        result['version'] = result.get('version', 1) + 1
+        response.headers['ETag'] = f'"{result["version"]}"'
         
         logger.info(f"Booking {booking_id} status updated to {status_value}")
         
+        delta = slot_delta(old_status, status_value)
+        try:
+            await adjust_slots({(result['date'], result['time']): delta})
+        except Exception as e:
+            logger.error(f"Failed to update slot count for booking {booking_id}: {str(e)}")
+        if delta < 0:
+            # A place was freed - hand it to the first waiter right away
+            await promote_waiters({(result['date'], result['time']): 1})
+        
+        try:
+            await record_status_change(result, old_status, status_value)
+        except Exception as e:
+            logger.error(f"Failed to update customer activity for booking {booking_id}: {str(e)}")
+        
         # Convert ISO string timestamps back to datetime objects
         if isinstance(result.get('createdAt'), str):
             result['createdAt'] = datetime.fromisoformat(result['createdAt'])
@@ -371,6 +945,187 @@ async def update_booking_status(booking_id: str, status_update: dict):
         logger.error(f"Error updating booking {booking_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to update booking")
 
+@api_router.put("/bookings/{booking_id}/schedule", response_model=Booking)
+async def reschedule_booking(booking_id: str, schedule: ScheduleUpdate, request: Request, response: Response):
+    """
+    Move a booking to a new date/time, keeping its ID, customer and history.
+    The new slot is claimed before the booking moves and released again if
+    the move fails; the old slot is released once it has moved.
+    """
+    expected_version = parse_if_match(request.headers.get('if-match'))
+    if expected_version is None:
+        expected_version = schedule.expectedVersion
+    
+    try:
+        current = await db.bookings.find_one({"bookingId": booking_id}, {"_id": 0})
+        if not current:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        current_version = current.get('version', 1)
+        if expected_version is not None and current_version != expected_version:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Booking was modified by someone else (now version {current_version})"
+            )
+        if current.get('status') in ('completed', 'cancelled'):
+            raise HTTPException(status_code=409, detail=f"Cannot reschedule a {current['status']} booking")
+        
+        old_date, old_time = current['date'], current['time']
+        if (schedule.date, schedule.time) == (old_date, old_time):
+            response.headers['ETag'] = f'"{current_version}"'
+            return Booking(**current)
+        
+        if not await claim_slot(schedule.date, schedule.time):
+            raise HTTPException(status_code=409, detail="This time slot is full")
+        
+        moved = {**current, "date": schedule.date, "time": schedule.time}
+        updated_at = datetime.utcnow().isoformat()
+        try:
+            # Compare-and-set on the version read above, so a concurrent change
+            # (status update or another reschedule) is not overwritten
+            result = await db.bookings.update_one(
+                {"bookingId": booking_id, "version": version_condition(current_version), "status": current['status']},
+                {"$set": {
+                    "date": schedule.date,
+                    "time": schedule.time,
+                    "fingerprint": booking_fingerprint(moved),
+                    "updatedAt": updated_at
+                }, "$inc": {"version": 1}}
+            )
+        except DuplicateKeyError:
+            await release_slot(schedule.date, schedule.time)
+            raise HTTPException(status_code=409, detail="This customer already has a booking in that slot")
+        except Exception:
+            await release_slot(schedule.date, schedule.time)
+            raise
+        if not result.modified_count:
+            await release_slot(schedule.date, schedule.time)
+            raise HTTPException(status_code=409, detail="Booking was modified by someone else, reload and retry")
+        
+        try:
+            await release_slot(old_date, old_time)
+        except Exception as e:
+            logger.error(f"Failed to release slot {old_date} {old_time} for booking {booking_id}: {str(e)}")
+        await promote_waiters({(old_date, old_time): 1})
+        
+        moved['updatedAt'] = updated_at
+        moved['version'] = current_version + 1
+        response.headers['ETag'] = f'"{moved["version"]}"'
+        logger.info(f"Booking {booking_id} rescheduled from {old_date} {old_time} to {schedule.date} {schedule.time}")
+        
+        try:
+            await record_reschedule(moved)
+        except Exception as e:
+            logger.error(f"Failed to update customer activity for booking {booking_id}: {str(e)}")
+        
+        try:
+            await email_service.send_customer_rescheduled(moved, old_date, old_time)
+        except Exception as e:
+            logger.error(f"Failed to send reschedule email for booking {booking_id}: {str(e)}")
+        
+        return Booking(**moved)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error rescheduling booking {booking_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to reschedule booking")
+
+@api_router.put("/bookings/{booking_id}/occurrences/{occurrence_date}", response_model=Booking)
+async def update_occurrence(booking_id: str, occurrence_date: str, update: OccurrenceUpdate,
+                            request: Request, response: Response):
+    """
+    Skip or move one occurrence of a recurring booking (by its original date),
+    or restore it when neither skip nor a new date/time is given.
+    Only these exceptions are stored; the other occurrences follow the rule.
+    """
+    day = parse_query_date(occurrence_date, "occurrence date")
+    expected_version = parse_if_match(request.headers.get('if-match'))
+    if expected_version is None:
+        expected_version = update.expectedVersion
+    
+    try:
+        booking = await db.bookings.find_one({"bookingId": booking_id}, {"_id": 0})
+        if not booking:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        if not booking.get('recurrence'):
+            raise HTTPException(status_code=400, detail="Booking does not repeat")
+        if not is_occurrence(booking, day):
+            raise HTTPException(status_code=404, detail=f"Booking has no occurrence on {occurrence_date}")
+        
+        current_version = booking.get('version', 1)
+        if expected_version is not None and current_version != expected_version:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Booking was modified by someone else (now version {current_version})"
+            )
+        
+        field = f"recurrenceExceptions.{occurrence_date}"
+        updated_at = datetime.utcnow().isoformat()
+        change = {"$set": {"updatedAt": updated_at}, "$inc": {"version": 1}}
+        exceptions = dict(booking.get('recurrenceExceptions') or {})
+        if update.skip:
+            exceptions[occurrence_date] = {"skip": True}
+            change["$set"][field] = exceptions[occurrence_date]
+        elif update.date or update.time:
+            exceptions[occurrence_date] = {"date": update.date or occurrence_date, "time": update.time or booking['time']}
+            change["$set"][field] = exceptions[occurrence_date]
+        else:
+            exceptions.pop(occurrence_date, None)
+            change["$unset"] = {field: ""}
+        
+        result = await db.bookings.update_one(
+            {"bookingId": booking_id, "version": version_condition(current_version)}, change
+        )
+        if not result.modified_count:
+            raise HTTPException(status_code=409, detail="Booking was modified by someone else, reload and retry")
+        
+        booking.update(recurrenceExceptions=exceptions, updatedAt=updated_at, version=current_version + 1)
+        response.headers['ETag'] = f'"{booking["version"]}"'
+        logger.info(f"Booking {booking_id} occurrence {occurrence_date} updated: {exceptions.get(occurrence_date)}")
+        return Booking(**booking)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating occurrence {occurrence_date} of booking {booking_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to update occurrence")
+
+# Customer endpoints
+async def customer_with_bookings(customer: dict) -> dict:
+    bookings = await db.bookings.find(
+        {"customerId": customer['customerId']}, {"_id": 0}
+    ).sort("createdAt", -1).to_list(100)
+    return {"customer": Customer(**customer), "bookings": [Booking(**booking) for booking in bookings]}
+
+@api_router.get("/customers/lookup", dependencies=[Depends(require_admin_session)])
+async def lookup_customer(email: Optional[str] = None, phone: Optional[str] = None):
+    """Find a customer and their bookings by email or phone (admin only)"""
+    if not email and not phone:
+        raise HTTPException(status_code=400, detail="Provide an email or phone number")
+    
+    try:
+        customer = await find_customer(email, phone)
+        if not customer:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        return await customer_with_bookings(customer)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error looking up customer: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to look up customer")
+
+@api_router.get("/customers/{customer_id}", dependencies=[Depends(require_admin_session)])
+async def get_customer_by_id(customer_id: str):
+    """Get a customer and their bookings (admin only)"""
+    try:
+        customer = await get_customer(customer_id)
+        if not customer:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        return await customer_with_bookings(customer)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching customer {customer_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch customer")
+
 # New endpoint for sending custom messages
 class MessageRequest(BaseModel):
     to_email: str
@@ -439,9 +1194,87 @@ async def send_custom_message(message_req: MessageRequest):
     else:
         raise HTTPException(status_code=500, detail="Failed to send email")
 
+# Suppression list endpoints
+class SuppressionCreate(BaseModel):
+    email: str
+    reason: str
+    source: Optional[str] = None
+
+@api_router.api_route("/unsubscribe/{token}", methods=["GET", "POST"], response_class=HTMLResponse)
+async def unsubscribe(token: str):
+    """One-click unsubscribe from campaign emails (GET link or RFC 8058 POST)"""
+    email = verify_unsubscribe_token(token)
+    if not email:
+        raise HTTPException(status_code=400, detail="Invalid unsubscribe link")
+    
+    try:
+        await add_suppression(email, REASON_UNSUBSCRIBE, source='link')
+    except Exception as e:
+        logger.error(f"Error unsubscribing {email}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to unsubscribe")
+    
+    return """
+    <html>
+    <body style="font-family: Arial, sans-serif; text-align: center; padding: 60px;">
+        <h2>You have been unsubscribed</h2>
+        <p>You will no longer receive promotional emails from Golden Touch Cleaning Services.</p>
+    </body>
+    </html>
+    """
+
+@api_router.post("/suppressions", dependencies=[Depends(require_admin_session)])
+async def create_suppression(suppression: SuppressionCreate):
+    """
+    Record a hard bounce, complaint or unsubscribe reported by the email provider
+    (admin only - customers opt out through their signed unsubscribe link)
+    """
+    if suppression.reason not in SUPPRESSION_REASONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid reason. Must be one of: {', '.join(SUPPRESSION_REASONS)}"
+        )
+    
+    try:
+        created = await add_suppression(suppression.email, suppression.reason, source=suppression.source)
+    except Exception as e:
+        logger.error(f"Error adding suppression for {suppression.email}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to add suppression")
+    
+    return {"success": True, "created": created}
+
+# Campaign open tracking
+@api_router.get("/track/open.gif")
+async def track_open(c: str = "", r: str = "", t: str = ""):
+    """Tracking pixel - buffers the open event in memory and returns immediately"""
+    email = verify_unsubscribe_token(t) if c else None
+    if email:
+        open_tracker.record(c, r, email)
+    else:
+        open_events_total.inc('invalid')
+    
+    return Response(
+        content=TRANSPARENT_GIF,
+        media_type="image/gif",
+        headers={"Cache-Control": "no-store, no-cache, must-revalidate, private"}
+    )
+
+@api_router.get("/campaigns/{campaign_id}/stats", dependencies=[Depends(require_admin_session)])
+async def get_campaign_stats(campaign_id: str):
+    """Get rolled-up open counts for a campaign and its recent runs"""
+    stats = await db.campaign_stats.find_one({"campaignId": campaign_id}, {"_id": 0})
+    runs = await db.campaign_runs.find(
+        {"campaignId": campaign_id}, {"_id": 0}
+    ).sort("scheduledFor", -1).limit(10).to_list(10)
+    return {
+        "campaignId": campaign_id,
+        "opens": stats.get('opens', 0) if stats else 0,
+        "lastOpenAt": stats.get('lastOpenAt') if stats else None,
+        "runs": runs
+    }
+
 # Email campaign endpoints (for testing)
-@api_router.post("/campaigns/trigger")
-async def trigger_campaign(campaign_type: str = "monday"):
+@api_router.post("/campaigns/trigger", dependencies=[Depends(require_admin_session)])
+async def trigger_campaign(campaign_type: str = "monday", segment: str = "all"):
     """Manually trigger an email campaign for testing"""
     try:
         from email_campaign import send_weekly_campaign
@@ -449,32 +1282,125 @@ async def trigger_campaign(campaign_type: str = "monday"):
         if campaign_type not in ['monday', 'friday']:
             raise HTTPException(status_code=400, detail="Invalid campaign type. Use 'monday' or 'friday'")
         
+        if segment not in SEGMENTS:
+            raise HTTPException(status_code=400, detail=f"Invalid segment. Must be one of: {', '.join(SEGMENTS)}")
+        
         # Run campaign in background
         import asyncio
-        asyncio.create_task(send_weekly_campaign(campaign_type))
+        asyncio.create_task(send_weekly_campaign(campaign_type, segment))
         
         return {
             "success": True, 
-            "message": f"{campaign_type.capitalize()} campaign triggered successfully"
+            "message": f"{campaign_type.capitalize()} campaign triggered successfully for segment '{segment}'"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error triggering campaign: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to trigger campaign")
 
-@api_router.get("/campaigns/status")
+@api_router.get("/campaigns/status", dependencies=[Depends(require_admin_session)])
 async def get_campaign_status():
     """Get scheduled campaigns status"""
-    jobs = scheduler.get_jobs()
-    campaign_jobs = [
-        {
-            "id": job.id,
-            "name": job.name,
-            "next_run": job.next_run_time.isoformat() if job.next_run_time else None
-        }
-        for job in jobs if 'campaign' in job.id
-    ]
+    campaigns = await db.campaigns.find({}, {"_id": 0}).to_list(None)
+    campaign_jobs = []
+    for campaign in campaigns:
+        job = scheduler.get_job(job_id(campaign['campaignId']))
+        campaign_jobs.append({
+            "id": campaign['campaignId'],
+            "name": campaign['name'],
+            "paused": campaign.get('paused', False),
+            "last_run": campaign.get('lastRunAt'),
+            "next_run": job.next_run_time.isoformat() if job and job.next_run_time else None
+        })
     return {"campaigns": campaign_jobs}
 
+def validate_campaign_fields(fields: dict):
+    """Validate template, segment, misfire policy and schedule of a campaign"""
+    if 'template' in fields and fields['template'] not in TEMPLATES:
+        raise HTTPException(status_code=400, detail=f"Invalid template. Must be one of: {', '.join(TEMPLATES)}")
+    if 'segment' in fields and fields['segment'] not in SEGMENTS:
+        raise HTTPException(status_code=400, detail=f"Invalid segment. Must be one of: {', '.join(SEGMENTS)}")
+    if 'misfirePolicy' in fields and fields['misfirePolicy'] not in MISFIRE_POLICIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid misfire policy. Must be one of: {', '.join(MISFIRE_POLICIES)}"
+        )
+    if 'schedule' in fields:
+        try:
+            build_trigger(fields['schedule'])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid schedule: {str(e)}")
+
+def campaign_from_doc(doc: dict) -> Campaign:
+    """Convert a stored campaign document to a Campaign model"""
+    if isinstance(doc.get('createdAt'), str):
+        doc['createdAt'] = datetime.fromisoformat(doc['createdAt'])
+    if isinstance(doc.get('updatedAt'), str):
+        doc['updatedAt'] = datetime.fromisoformat(doc['updatedAt'])
+    return Campaign(**doc)
+
+@api_router.get("/campaigns", response_model=List[Campaign], dependencies=[Depends(require_admin_session)])
+async def list_campaigns():
+    """List campaign definitions"""
+    campaigns = await db.campaigns.find({}, {"_id": 0}).to_list(None)
+    return [campaign_from_doc(campaign) for campaign in campaigns]
+
+@api_router.post("/campaigns", response_model=Campaign, dependencies=[Depends(require_admin_session)])
+async def create_campaign(campaign_data: CampaignCreate):
+    """Create a campaign definition (picked up by every worker within a minute)"""
+    validate_campaign_fields(campaign_data.model_dump())
+    
+    campaign = Campaign(**campaign_data.model_dump())
+    doc = campaign.model_dump()
+    doc['createdAt'] = doc['createdAt'].isoformat()
+    doc['updatedAt'] = doc['updatedAt'].isoformat()
+    
+    try:
+        await db.campaigns.insert_one(doc)
+    except Exception as e:
+        logger.error(f"Error creating campaign: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to create campaign")
+    
+    logger.info(f"Campaign created: {campaign.campaignId} ({campaign.name})")
+    await sync_campaigns()
+    return campaign
+
+async def apply_campaign_update(campaign_id: str, fields: dict) -> Campaign:
+    """Persist changed campaign fields and bump updatedAt so workers resync"""
+    fields['updatedAt'] = datetime.utcnow().isoformat()
+    result = await db.campaigns.find_one_and_update(
+        {"campaignId": campaign_id},
+        {"$set": fields},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not result:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    
+    logger.info(f"Campaign {campaign_id} updated: {', '.join(fields)}")
+    await sync_campaigns()
+    return campaign_from_doc(result)
+
+@api_router.put("/campaigns/{campaign_id}", response_model=Campaign, dependencies=[Depends(require_admin_session)])
+async def update_campaign(campaign_id: str, campaign_update: CampaignUpdate):
+    """Update a campaign's schedule, template, segment or rate limits"""
+    fields = campaign_update.model_dump(exclude_unset=True)
+    if not fields:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    validate_campaign_fields(fields)
+    return await apply_campaign_update(campaign_id, fields)
+
+@api_router.post("/campaigns/{campaign_id}/pause", response_model=Campaign, dependencies=[Depends(require_admin_session)])
+async def pause_campaign(campaign_id: str):
+    """Pause a campaign"""
+    return await apply_campaign_update(campaign_id, {"paused": True})
+
+@api_router.post("/campaigns/{campaign_id}/resume", response_model=Campaign, dependencies=[Depends(require_admin_session)])
+async def resume_campaign(campaign_id: str):
+    """Resume a paused campaign"""
+    return await apply_campaign_update(campaign_id, {"paused": False})
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -486,30 +1412,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Schedule email campaigns
-from email_campaign import run_monday_campaign, run_friday_campaign
-
-# Monday morning campaign - 9:00 AM every Monday
-scheduler.add_job(
-    run_monday_campaign,
-    CronTrigger(day_of_week='mon', hour=9, minute=0),
-    id='monday_campaign',
-    name='Monday Morning Email Campaign',
-    replace_existing=True
-)
-
-# Friday morning campaign - 9:00 AM every Friday
-scheduler.add_job(
-    run_friday_campaign,
-    CronTrigger(day_of_week='fri', hour=9, minute=0),
-    id='friday_campaign',
-    name='Friday Morning Email Campaign',
-    replace_existing=True
-)
+# Background startup tasks (kept referenced so they are not garbage collected)
+startup_tasks = []
 
-logger.info("Email campaigns scheduled: Monday & Friday at 9:00 AM")
+@app.on_event("startup")
+async def startup():
+    # Campaign emails cannot carry unsubscribe links without their signing secret
+    require_unsubscribe_secret()
+    # Index creation can be slow on large collections - don't block startup on it
+    startup_tasks.append(asyncio.create_task(ensure_indexes(db)))
+    await init_admin_password_hash()
+    await start_session_maintenance()
+    await start_campaign_scheduler()
+    open_tracker.start(db)
+    rate_limiter.start(db)
+    
+    # Safety net for expired sessions in case the TTL index is missing
+    scheduler.add_job(
+        clean_expired_sessions,
+        IntervalTrigger(hours=1),
+        id='clean_expired_sessions',
+        replace_existing=True
+    )
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     scheduler.shutdown()
+    await booking_inserts.flush()
+    await open_tracker.stop()
+    await stop_session_maintenance()
+    await rate_limiter.stop()
     client.close()
\ No newline at end of file
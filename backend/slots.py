@@ -0,0 +1,163 @@
+"""
+Booked counts per time slot (date + time).
+
+Each slot is one small document in `slots` holding the number of active
+(not cancelled) bookings in it. Claiming a slot is a single conditional
+upsert, so two requests cannot both take the last place. With
+BOOKING_SLOT_CAPACITY unset slots are unlimited and only counted.
+
+Occurrences of recurring bookings (after the first, which is counted
+like any booking) are not stored; series_places() expands them from the
+active series so capacity checks and availability include them.
+
+Customer bookings (create_booking, reschedules) claim a place and fail
+when the slot is full. Staff status changes and imports adjust the
+counts without checking capacity, so staff can still overbook.
+"""
+import logging
+import os
+from datetime import timedelta
+from typing import Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from recurrence import expand_booking, iter_occurrences, parse_date, recurring_bookings_query
+
+logger = logging.getLogger(__name__)
+
+BOOKING_SLOT_CAPACITY = int(os.environ.get('BOOKING_SLOT_CAPACITY', 0)) or None  # None = unlimited
+
+# How far ahead a new recurring booking's occurrences are checked against full slots
+SERIES_CHECK_DAYS = 365
+
+# Fields needed to expand recurring bookings
+SERIES_PROJECTION = {'_id': 0, 'bookingId': 1, 'status': 1, 'date': 1, 'time': 1,
+                     'recurrence': 1, 'recurrenceExceptions': 1}
+
+# Database handle - set by server.py after db connection is established
+db_slots = None
+
+
+def set_slots_db(database):
+    """Set the database connection for slot counts"""
+    global db_slots
+    db_slots = database
+
+
+def slot_id(date: str, time: str) -> str:
+    return f"{date}|{time}"
+
+
+def slot_delta(old_status: Optional[str], new_status: str) -> int:
+    """Change in a slot's booked count when a booking moves between statuses"""
+    return (old_status == 'cancelled') - (new_status == 'cancelled')
+
+
+async def series_places(start: str, end: str) -> dict:
+    """
+    Places taken by recurring booking occurrences between two dates that
+    the slot counts do not hold ({(date, time): places}).
+    """
+    places = {}
+    window_start, window_end = parse_date(start), parse_date(end)
+    async for booking in db_slots.bookings.find(recurring_bookings_query(start, end), SERIES_PROJECTION):
+        first_counted = False
+        for entry in expand_booking(booking, window_start, window_end):
+            if entry['index'] == 0 and not entry['rescheduled']:
+                # Already in the slot counts
+                first_counted = True
+                continue
+            key = (entry['date'], entry['time'])
+            places[key] = places.get(key, 0) + 1
+        if start <= booking['date'] <= end and not first_counted:
+            # The first occurrence was skipped or moved but still holds its slot count
+            key = (booking['date'], booking['time'])
+            places[key] = places.get(key, 0) - 1
+    return places
+
+
+async def claim_slot(date: str, time: str, capacity: Optional[int] = BOOKING_SLOT_CAPACITY) -> bool:
+    """Take one place in a slot; False if it is full (counting recurring occurrences)"""
+    if db_slots is None:
+        raise RuntimeError("Database not initialized for slots")
+
+    query = {'_id': slot_id(date, time)}
+    if capacity is not None:
+        capacity -= (await series_places(date, date)).get((date, time), 0)
+        if capacity <= 0:
+            return False
+        query['booked'] = {'$lt': capacity}
+    try:
+        await db_slots.slots.update_one(
+            query,
+            {'$inc': {'booked': 1}, '$setOnInsert': {'date': date, 'time': time}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The slot exists but did not match the capacity condition
+        return False
+    return True
+
+
+async def release_slot(date: str, time: str):
+    """Give back one place in a slot"""
+    await db_slots.slots.update_one(
+        {'_id': slot_id(date, time), 'booked': {'$gt': 0}},
+        {'$inc': {'booked': -1}}
+    )
+
+
+async def adjust_slots(changes: dict):
+    """Apply {(date, time): delta} to slot counts with one bulk_write, ignoring capacity"""
+    requests = [
+        UpdateOne(
+            {'_id': slot_id(date, time)},
+            {'$inc': {'booked': delta}, '$setOnInsert': {'date': date, 'time': time}},
+            upsert=True
+        )
+        for (date, time), delta in changes.items() if delta
+    ]
+    if requests:
+        await db_slots.slots.bulk_write(requests, ordered=False)
+
+
+async def full_series_dates(date: str, time: str, rule: dict,
+                            capacity: Optional[int] = BOOKING_SLOT_CAPACITY) -> list:
+    """
+    Dates within SERIES_CHECK_DAYS on which a new recurring booking starting
+    at date/time would find its slot full (its first date is claimed as usual).
+    """
+    if capacity is None:
+        return []
+    start = parse_date(date)
+    dates = [
+        day.isoformat()
+        for index, day in iter_occurrences(start, rule, start, start + timedelta(days=SERIES_CHECK_DAYS))
+        if index > 0
+    ]
+    if not dates:
+        return []
+
+    booked = {
+        slot['date']: slot['booked']
+        async for slot in db_slots.slots.find({'_id': {'$in': [slot_id(day, time) for day in dates]}})
+    }
+    places = await series_places(dates[0], dates[-1])
+    return [day for day in dates if booked.get(day, 0) + places.get((day, time), 0) >= capacity]
+
+
+async def get_slot(date: str, time: str) -> dict:
+    """Booked count (with recurring occurrences) and remaining places (None if unlimited) of a slot"""
+    slot = await db_slots.slots.find_one({'_id': slot_id(date, time)})
+    booked = max((slot['booked'] if slot else 0) + (await series_places(date, date)).get((date, time), 0), 0)
+    remaining = None if BOOKING_SLOT_CAPACITY is None else max(BOOKING_SLOT_CAPACITY - booked, 0)
+    return {'date': date, 'time': time, 'booked': booked, 'capacity': BOOKING_SLOT_CAPACITY, 'remaining': remaining}
+
+
+async def get_day_slots(date: str) -> dict:
+    """Booked count per time for one date, with recurring occurrences ({time: booked})"""
+    booked = {slot['time']: slot['booked'] async for slot in db_slots.slots.find({'date': date})}
+    for (_, time), places in (await series_places(date, date)).items():
+        booked[time] = booked.get(time, 0) + places
+    return {time: max(count, 0) for time, count in booked.items()}
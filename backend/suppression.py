@@ -0,0 +1,119 @@
+"""
+Email suppression list (unsubscribes, hard bounces, complaints)
+"""
+import os
+import hmac
+import base64
+import hashlib
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Suppression reasons
+REASON_UNSUBSCRIBE = 'unsubscribe'
+REASON_HARD_BOUNCE = 'hard_bounce'
+REASON_COMPLAINT = 'complaint'
+SUPPRESSION_REASONS = (REASON_UNSUBSCRIBE, REASON_HARD_BOUNCE, REASON_COMPLAINT)
+
+# Secret used to sign unsubscribe links and open-tracking tokens. Must be
+# identical on every worker, otherwise links generated by one process are
+# rejected by another. There is no fallback: the server refuses to start
+# without it (see require_unsubscribe_secret).
+UNSUBSCRIBE_SECRET = os.environ.get('UNSUBSCRIBE_SECRET', '')
+
+# Database handle - set by server.py after db connection is established
+db_suppressions = None
+
+
+def set_suppression_db(database):
+    """Set the database connection for the suppression list"""
+    global db_suppressions
+    db_suppressions = database
+
+
+def normalize_email(email: str) -> str:
+    """Normalize an email address for suppression lookups"""
+    return (email or '').strip().lower()
+
+
+def require_unsubscribe_secret():
+    """Fail unless a dedicated secret for signing unsubscribe links is configured"""
+    if not UNSUBSCRIBE_SECRET:
+        raise RuntimeError("UNSUBSCRIBE_SECRET must be set to sign unsubscribe and tracking links")
+
+
+def _sign(email: str) -> str:
+    require_unsubscribe_secret()
+    digest = hmac.new(UNSUBSCRIBE_SECRET.encode(), email.encode(), hashlib.sha256).hexdigest()
+    return digest[:32]
+
+
+def make_unsubscribe_token(email: str) -> str:
+    """Create a signed, URL-safe unsubscribe token for an email address"""
+    email = normalize_email(email)
+    encoded = base64.urlsafe_b64encode(email.encode()).decode().rstrip('=')
+    return f"{encoded}.{_sign(email)}"
+
+
+def verify_unsubscribe_token(token: str) -> Optional[str]:
+    """Return the email address for a valid unsubscribe token, None otherwise"""
+    try:
+        encoded, signature = token.rsplit('.', 1)
+        padding = '=' * (-len(encoded) % 4)
+        email = base64.urlsafe_b64decode(encoded + padding).decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    # Compare bytes: compare_digest rejects str arguments with non-ASCII characters
+    if not hmac.compare_digest(signature.encode(errors='replace'), _sign(email).encode()):
+        return None
+    return email
+
+
+async def add_suppression(email: str, reason: str, source: Optional[str] = None) -> bool:
+    """
+    Add an address to the suppression list.
+    Returns True if the address was newly suppressed.
+    """
+    if db_suppressions is None:
+        raise RuntimeError("Database not initialized for suppressions")
+
+    if reason not in SUPPRESSION_REASONS:
+        raise ValueError(f"Invalid suppression reason: {reason}")
+
+    email = normalize_email(email)
+    if not email:
+        return False
+
+    try:
+        await db_suppressions.suppressions.insert_one({
+            'email': email,
+            'reason': reason,
+            'source': source,
+            'createdAt': datetime.utcnow().isoformat()
+        })
+    except DuplicateKeyError:
+        return False
+
+    logger.info(f"Suppressed {email} ({reason})")
+    return True
+
+
+async def get_suppressed(emails: Iterable[str]) -> set:
+    """Return the subset of emails that are suppressed, using one indexed $in query"""
+    if db_suppressions is None:
+        raise RuntimeError("Database not initialized for suppressions")
+
+    normalized = list({normalize_email(email) for email in emails if email})
+    if not normalized:
+        return set()
+
+    cursor = db_suppressions.suppressions.find(
+        {'email': {'$in': normalized}},
+        {'email': 1, '_id': 0}
+    )
+    return {doc['email'] async for doc in cursor}
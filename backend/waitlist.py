@@ -0,0 +1,89 @@
+"""
+Waitlist for full time slots.
+
+Customers who find a slot full can join its waitlist. When a booking in
+that slot is cancelled (or rescheduled away), server.py promotes the
+first waiter straight from that event: claim_next_waiter takes the
+oldest waiting entry of the slot in one indexed find_one_and_update, so
+each freed place costs one query and concurrent cancellations never
+promote the same person twice.
+"""
+import logging
+import uuid
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+WAITLIST_STATUSES = ('waiting', 'promoting', 'promoted', 'expired')
+
+# Database handle - set by server.py after db connection is established
+db_waitlist = None
+
+
+def set_waitlist_db(database):
+    """Set the database connection for the waitlist"""
+    global db_waitlist
+    db_waitlist = database
+
+
+async def join_waitlist(entry: dict) -> dict:
+    """Add a booking request (BookingCreate fields) to the waitlist of its slot"""
+    if db_waitlist is None:
+        raise RuntimeError("Database not initialized for waitlist")
+
+    doc = {
+        **entry,
+        'waitlistId': str(uuid.uuid4()),
+        'status': 'waiting',
+        'createdAt': datetime.utcnow().isoformat(),
+    }
+    await db_waitlist.waitlist.insert_one(doc)
+    doc.pop('_id', None)
+    return doc
+
+
+async def waitlist_position(entry: dict) -> int:
+    """1-based position of a waiting entry in its slot's queue"""
+    ahead = await db_waitlist.waitlist.count_documents({
+        'date': entry['date'],
+        'time': entry['time'],
+        'status': 'waiting',
+        'createdAt': {'$lt': entry['createdAt']},
+    })
+    return ahead + 1
+
+
+async def claim_next_waiter(date: str, time: str) -> Optional[dict]:
+    """Take the oldest waiting entry of a slot (it moves to 'promoting'), if any"""
+    return await db_waitlist.waitlist.find_one_and_update(
+        {'date': date, 'time': time, 'status': 'waiting'},
+        {'$set': {'status': 'promoting', 'updatedAt': datetime.utcnow().isoformat()}},
+        sort=[('createdAt', 1)],
+        projection={'_id': 0}
+    )
+
+
+async def finish_waiter(waitlist_id: str, status: str, booking_id: Optional[str] = None):
+    """Record how a claimed entry ended: promoted (with its booking), expired, or back to waiting"""
+    update = {'status': status, 'updatedAt': datetime.utcnow().isoformat()}
+    if booking_id:
+        update['bookingId'] = booking_id
+    await db_waitlist.waitlist.update_one({'waitlistId': waitlist_id}, {'$set': update})
+
+
+async def get_waiting_entry(waitlist_id: str) -> Optional[dict]:
+    """A waitlist entry that is still waiting, if any"""
+    return await db_waitlist.waitlist.find_one({'waitlistId': waitlist_id, 'status': 'waiting'}, {'_id': 0})
+
+
+async def count_slot_waitlist(date: str, time: str) -> int:
+    """Number of entries waiting for a slot"""
+    return await db_waitlist.waitlist.count_documents({'date': date, 'time': time, 'status': 'waiting'})
+
+
+async def get_slot_waitlist(date: str, time: str) -> list:
+    """Waiting entries of a slot, first in line first"""
+    return await db_waitlist.waitlist.find(
+        {'date': date, 'time': time, 'status': 'waiting'}, {'_id': 0}
+    ).sort('createdAt', 1).to_list(1000)
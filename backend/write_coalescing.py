@@ -0,0 +1,87 @@
+"""
+Insert coalescing for burst load (promo blasts).
+
+Each create_booking normally makes its own insert_one round trip. With
+BOOKING_INSERT_BATCH_MS set, concurrent inserts are collected for up to
+that many milliseconds (or until BOOKING_INSERT_BATCH_SIZE documents are
+waiting) and written with one unordered insert_many. Every caller gets
+its own result or error: a document that hits a unique index raises
+DuplicateKeyError for that caller only, as insert_one would.
+
+Off by default - a lone request pays the batch delay for nothing.
+"""
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import InsertOneResult
+
+logger = logging.getLogger(__name__)
+
+BOOKING_INSERT_BATCH_MS = float(os.environ.get('BOOKING_INSERT_BATCH_MS', 0))  # 0 = no coalescing
+BOOKING_INSERT_BATCH_SIZE = int(os.environ.get('BOOKING_INSERT_BATCH_SIZE', 100))
+
+
+class InsertCoalescer:
+    """insert_one replacement that batches concurrent calls into insert_many"""
+
+    def __init__(self, collection, max_delay: float = 0.0, max_batch: int = 100):
+        self.collection = collection
+        self.max_delay = max_delay  # seconds; 0 passes inserts straight through
+        self.max_batch = max_batch
+        self._pending = []  # (document, future)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()  # running flush tasks (kept referenced)
+
+    async def insert_one(self, document: dict) -> InsertOneResult:
+        if self.max_delay <= 0:
+            return await self.collection.insert_one(document)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((document, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush)
+        # shield: a cancelled request must not cancel the shared write
+        return await asyncio.shield(future)
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._write(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, batch: list):
+        documents = [document for document, _ in batch]
+        errors = {}
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details['writeErrors']:
+                exc_type = DuplicateKeyError if error['code'] == 11000 else OperationFailure
+                errors[error['index']] = exc_type(error['errmsg'], error['code'], error)
+        except Exception as e:
+            logger.error(f"Batched insert of {len(batch)} documents failed: {str(e)}")
+            errors = {index: e for index in range(len(batch))}
+
+        for index, (document, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in errors:
+                future.set_exception(errors[index])
+            else:
+                future.set_result(InsertOneResult(document['_id'], True))
+
+    async def flush(self):
+        """Write anything still waiting (on shutdown)"""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
@@ -0,0 +1,32 @@
+"""
+Unsubscribe / open-tracking token checks (backend/suppression.py)
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+import suppression  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def unsubscribe_secret(monkeypatch):
+    monkeypatch.setattr(suppression, 'UNSUBSCRIBE_SECRET', 'test-secret')
+
+
+def test_valid_token_round_trips():
+    token = suppression.make_unsubscribe_token('Jane@Example.com ')
+    assert suppression.verify_unsubscribe_token(token) == 'jane@example.com'
+
+
+@pytest.mark.parametrize('token', [
+    'YUB4LmNvbQ.éx',   # non-ASCII signature
+    'YUB4LmNvbQ.é',
+    'YUB4LmNvbQ.\udce9',  # lone surrogate from a badly encoded URL
+    'YUB4LmNvbQ.' + '0' * 32,  # wrong signature
+    'éé.abc',  # non-ASCII payload
+    'no-separator',
+])
+def test_invalid_tokens_are_rejected(token):
+    assert suppression.verify_unsubscribe_token(token) is None